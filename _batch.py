@@ -0,0 +1,295 @@
+import threading
+import queue
+import json
+import time
+import sys
+import os
+
+from utils_generic import ActionHandler, setup_driver, DRIVER_PROFILES
+from utils_logging import setup_logging, get_logger
+from procedures.obtain_cardsets import get_all_cardsets
+from procedures.process_cardset import extract_cardsets
+from procedures.network_capture import extract_cardsets_network
+from procedures.scrape_index import ScrapeIndex
+from procedures.login import login
+from procedures.catalog_cache import CatalogCache
+from procedures.card_model import export_account
+from procedures.media_store import MediaStore
+from procedures.cardset_registry import CardsetRegistry
+
+logger = get_logger("batch")
+
+# - - - CONFIGURATION - - -
+
+URL = "https://buffl.co"  # Same target as in _main.py
+
+ACCOUNTS_PATH = "credentials/accounts.json"  # [{"name": "...", "email": "...", "password": "..."}, ...], 'name' is optional
+
+PROFILE = os.environ.get("BUFFL_PROFILE", "production")  # Driver profile of every browser, has to be headless - nobody watches a batch run
+
+BROWSERS = 2  # Accounts scraped at the same time, one browser each
+
+RETRIES = 2  # Further attempts of an account after a failed one (failed login, crashed browser), the index resumes where it stopped
+RETRY_DELAY = 60  # Seconds before a failed account is tried again, doubled with every attempt
+
+ENGINE = "ui"  # 'ui' or 'network', see _main.py
+
+COMPACT_OUTPUT = True  # see _main.py
+
+FIRST_CARD_CHECK = False  # see _main.py
+
+ACCOUNTS_DIR = "results/accounts"  # Every account gets its own cardset files, index, catalog and export in '<dir>/<name>'
+SESSIONS_DIR = "credentials/sessions"  # Saved login session per account ('<dir>/<name>.json')
+
+CATALOG_TTL = 24 * 60 * 60  # see _main.py
+
+REGISTRY_PATH = "results/accounts/registry.sqlite"  # Cardsets exported by one account are linked for the others instead of scraped again, None to disable
+REGISTRY_WINDOW = 24 * 60 * 60  # Seconds an export is reused by other accounts
+
+REPORT_PATH = "results/accounts/report.json"  # Throughput and errors of every account and of the whole run
+
+LOG_LEVEL = os.environ.get("BUFFL_LOG_LEVEL", "INFO")
+LOG_PATH = "results/accounts/batch.jsonl"  # Every record with the account ('thread') it belongs to, None to disable
+
+# - - - - - -
+
+def main():
+
+    setup_logging(LOG_LEVEL, LOG_PATH)
+
+    if not DRIVER_PROFILES[PROFILE]["headless"]:
+        raise ValueError(f"The batch runs unattended, choose a headless driver profile instead of '{PROFILE}'")
+
+    accounts = load_accounts(ACCOUNTS_PATH)
+
+    registry = CardsetRegistry(REGISTRY_PATH, window=REGISTRY_WINDOW) if REGISTRY_PATH else None
+
+    report = run_batch(accounts, browsers=BROWSERS, retries=RETRIES, retry_delay=RETRY_DELAY, registry=registry)
+
+    if registry:
+        registry.close()
+
+    os.makedirs(os.path.dirname(REPORT_PATH) or ".", exist_ok=True)
+    with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logger.info("\n____________________________________________________________\n")
+
+    for entry in report["accounts"]:
+        logger.info(
+            "%s %s: %d cardsets, %d cards in %.0fs (%.2f cards/s), %d attempt(s)",
+            "✓" if entry["status"] == "ok" else "❌", entry["name"], entry["cardsets"], entry["cards"],
+            entry["seconds"], entry["cards_per_second"], entry["attempts"]
+        )
+
+    totals = report["totals"]
+    logger.info(
+        "\n%d/%d accounts done, %d cards in %.0fs (%.2f cards/s with %d browsers), report saved to %s",
+        totals["accounts"] - totals["failed"], totals["accounts"], totals["cards"], report["seconds"],
+        totals["cards_per_second"], report["browsers"], REPORT_PATH
+    )
+
+    sys.exit(1 if totals["failed"] else 0)  # lets cron / CI notice failed accounts
+
+# - - - SCHEDULING - - -
+
+def run_batch(accounts, browsers=2, retries=2, retry_delay=60, registry: CardsetRegistry = None):
+    """
+    Scrape the accounts with a pool of browsers, each worker pulling the next account from a shared queue
+
+    A failed account is put back at the end of the queue (so the other accounts are not held up) and tried
+    again after 'retry_delay' seconds, doubled with every attempt. Its browser is closed in between.
+
+    Args:
+        accounts: Accounts as returned by load_accounts
+        browsers: Number of accounts scraped at the same time (default: 2)
+        retries: Further attempts per account after a failed one (default: 2)
+        retry_delay: Seconds before the first retry of an account (default: 60)
+        registry: Optional CardsetRegistry, cardsets one account exported are linked for the others
+
+    Returns:
+        Report dictionary with an entry per account and the totals of the run
+    """
+
+    logger.info("\nStarting to scrape %d accounts with %d browsers...", len(accounts), browsers)
+
+    account_queue = queue.Queue()
+    for account in accounts:
+        account_queue.put((account, 1, 0.0))  # account, attempt, not before (perf_counter)
+
+    entries = {account["name"]: new_entry(account) for account in accounts}
+    pending = len(accounts)  # accounts neither done nor given up, workers stop once it reaches 0
+    lock = threading.Lock()
+
+    store = MediaStore()  # content-addressed, images shared by several accounts are stored once
+
+    def work():
+        nonlocal pending
+
+        while True:
+            with lock:
+                if not pending:
+                    return
+            try:
+                account, attempt, not_before = account_queue.get(timeout=1)
+            except queue.Empty:
+                continue  # another worker's account may still be put back for a retry
+
+            entry = entries[account["name"]]
+            threading.current_thread().name = account["name"]  # tells the log records of the accounts apart
+
+            time.sleep(max(0.0, not_before - time.perf_counter()))
+
+            logger.info("\n🔑 Account '%s', attempt %d of %d", account["name"], attempt, retries + 1)
+            start = time.perf_counter()
+
+            try:
+                result = run_account(account, store, registry)
+                entry.update(result, status="ok")
+
+            except Exception as e:
+                entry["errors"].append({"attempt": attempt, "error": f"{type(e).__name__}: {e}"})
+
+                if attempt <= retries:
+                    delay = retry_delay * 2 ** (attempt - 1)
+                    logger.warning("⚠️ Account '%s' failed (%s), retrying in %ds", account["name"], e, delay)
+                    account_queue.put((account, attempt + 1, time.perf_counter() + delay))
+                else:
+                    logger.error("❌ Account '%s' failed %d times, giving up: %s", account["name"], attempt, e)
+                    entry["status"] = "failed"
+
+            finally:
+                entry["attempts"] = attempt
+                entry["seconds"] += time.perf_counter() - start
+
+                if entry["status"] != "pending":
+                    with lock:
+                        pending -= 1
+
+    started = time.time()
+    start = time.perf_counter()
+
+    threads = [threading.Thread(target=work, name=f"browser-{i + 1}", daemon=True) for i in range(max(1, min(browsers, len(accounts))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    seconds = time.perf_counter() - start
+
+    for entry in entries.values():
+        entry["seconds"] = round(entry["seconds"], 1)
+        entry["cards_per_second"] = round(entry["cards"] / entry["seconds"], 3) if entry["seconds"] else 0.0
+
+    cards = sum(entry["cards"] for entry in entries.values())
+
+    return {
+        "started": started,
+        "seconds": round(seconds, 1),
+        "browsers": browsers,
+        "accounts": list(entries.values()),
+        "totals": {
+            "accounts": len(entries),
+            "failed": sum(entry["status"] != "ok" for entry in entries.values()),
+            "cardsets": sum(entry["cardsets"] for entry in entries.values()),
+            "cards": cards,
+            "exported": sum(entry["exported"] for entry in entries.values()),
+            "cards_per_second": round(cards / seconds, 3) if seconds else 0.0,  # of the whole pool (wall clock)
+        },
+    }
+
+
+def run_account(account, store: MediaStore = None, registry: CardsetRegistry = None):
+    """
+    Log in with one account in its own browser and export its new / changed cardsets (like _main.py)
+
+    Everything the account writes lives in its own paths (see account_paths), the browser profile included.
+
+    Returns:
+        Dictionary with the processed 'cardsets', the 'cards' scraped in this run and the 'exported' cards of the account
+    """
+    paths = account_paths(account)
+
+    driver = setup_driver(URL, profile=PROFILE, instance=account["name"], capture_network=ENGINE == "network")
+
+    try:
+        handler = ActionHandler(driver, wait_time=1)
+
+        if not login(handler, account["email"], account["password"], paths["session"]):
+            raise RuntimeError("login failed")
+
+        catalog = CatalogCache(paths["catalog"], ttl=CATALOG_TTL)
+        catalog_fresh = catalog.is_fresh()  # before get_all_cardsets saves a revalidated catalog
+        cardsets = get_all_cardsets(handler, cache=catalog)
+
+        index = ScrapeIndex(paths["index"])
+
+        try:
+            if catalog_fresh:  # after the TTL extract_cardset checks every cardset for edits itself (see _main.py)
+                changed = {c["cardset-href"] for c in catalog.changed(cardsets)}
+                cardsets = [c for c in cardsets if c["cardset-href"] in changed or not index.is_complete(c)]
+                logger.info("🔍 %d cardsets of '%s' are new, changed or not completely exported yet", len(cardsets), account["name"])
+
+            if ENGINE == "network":
+                scraped = extract_cardsets_network(handler, cardsets, index, compact=COMPACT_OUTPUT, output_dir=paths["data"], store=store, registry=registry)
+            else:
+                scraped = extract_cardsets(handler, cardsets, index, compact=COMPACT_OUTPUT, output_dir=paths["data"], store=store, registry=registry, first_card_check=FIRST_CARD_CHECK)
+        finally:
+            index.close()
+
+        return {
+            "cardsets": len(cardsets),
+            "cards": scraped,  # cards walked in this run, not those skipped as unchanged or linked from the registry
+            "exported": export_account(paths["data"], paths["export"]) if os.path.isdir(paths["data"]) else 0,
+        }
+
+    finally:
+        driver.quit()
+
+# - - - UTILITY - - -
+
+def load_accounts(path):
+    """
+    Read the accounts file, every account gets a unique 'name' (default: the part of the email before the '@')
+
+    The name is used for the account's directories, so it is reduced to letters, digits, '-', '_' and '.'.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        accounts = json.load(f)
+
+    names = set()
+
+    for account in accounts:
+        if not account.get("email") or not account.get("password"):
+            raise ValueError(f"Every account in {path} needs an 'email' and a 'password'")
+
+        name = account.get("name") or account["email"].split("@")[0]
+        account["name"] = ''.join(c if c.isalnum() or c in ['_', '-', '.'] else '_' for c in name).strip('.') or "account"
+
+        if account["name"] in names:
+            raise ValueError(f"The account name '{account['name']}' is used twice in {path}, set a distinct 'name'")
+        names.add(account["name"])
+
+    return accounts
+
+
+def account_paths(account):
+    """ Session, cardset files, index, catalog and export of an account """
+    directory = os.path.join(ACCOUNTS_DIR, account["name"])
+
+    return {
+        "session": os.path.join(SESSIONS_DIR, f"{account['name']}.json"),
+        "data": os.path.join(directory, "data"),
+        "index": os.path.join(directory, "index.sqlite"),
+        "catalog": os.path.join(directory, "catalog.json"),
+        "export": os.path.join(directory, "cards.parquet"),
+    }
+
+
+def new_entry(account):
+    return {"name": account["name"], "status": "pending", "attempts": 0, "cardsets": 0, "cards": 0, "exported": 0, "seconds": 0.0, "errors": []}
+
+# - - - - - -
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,108 @@
+import os
+
 from credentials.credentials import email, password
 
-from utils_generic import ActionHandler, setup_driver
+from utils_generic import ActionHandler, setup_driver, DRIVER_PROFILES
+from utils_profiling import Profiler
+from utils_logging import setup_logging, get_logger
 from procedures.obtain_cardsets import get_all_cardsets, cardsets_information
 from procedures.process_cardset import extract_cardsets
+from procedures.parallel_extraction import extract_cardsets_parallel
+from procedures.network_capture import extract_cardsets_network
+from procedures.scrape_index import ScrapeIndex
+from procedures.login import login
+from procedures.catalog_cache import CatalogCache
+from procedures.card_model import export_account
+
+logger = get_logger("main")
 
 # - - - CONFIGURATION - - -
 
 URL = "https://buffl.co"  # Replace with your target URL - buffl.co uses posthog, which should be disabled via setup_driver
 
+PROFILE = os.environ.get("BUFFL_PROFILE", "interactive")  # Driver profile from utils_generic.DRIVER_PROFILES, 'production' for unattended runs
+
+SESSION_PATH = "credentials/session.json"  # Saved login session (readable only by you), None to always log in via the form
+
+ENGINE = "ui"  # 'ui' clicks through every card, 'network' reads whole cardsets from the app's API responses (falls back to 'ui' per cardset)
+
+WORKERS = 1  # Number of browsers processing cardsets in parallel (additional ones share the login session)
+
+COMPACT_OUTPUT = True  # Cards are streamed to a .jsonl.part file while scraping, True turns it into the pretty .json array at the end, False into a .jsonl file
+
+INDEX_PATH = "results/index.sqlite"  # Remembers scraped cards to skip unchanged cardsets and resume interrupted ones, None to disable
+
+FIRST_CARD_CHECK = False  # Skip a complete cardset if the card shown on opening it is known - fast, but misses edits of other cards which kept the count
+
+CATALOG_PATH = "results/catalog.json"  # Cached list of courses and cardsets, None to always crawl all courses
+CATALOG_TTL = 24 * 60 * 60  # Seconds the cached catalog is used without checking the course badges
+
+EXPORT_PATH = "results/cards.parquet"  # All cards of the account in one Parquet file (newest file per cardset), None to disable
+
+PROFILING_REPORT = None  # e.g. "results/profile", times every WebDriver round trip by call site and writes a JSON report and trace there
+
+LOG_LEVEL = os.environ.get("BUFFL_LOG_LEVEL", "INFO")  # 'DEBUG' shows every element probe and image step
+LOG_PATH = None  # e.g. "results/run.jsonl", every log record down to DEBUG as one JSON object per line
+
 # - - - - - - 
 
 def main():
-    
-    driver = setup_driver(URL, headless=False)  # Set headless=False to see and interact with the browse
 
-    handler = ActionHandler(driver, wait_time=1)
+    setup_logging(LOG_LEVEL, LOG_PATH)
+    
+    driver = setup_driver(URL, profile=PROFILE, capture_network=ENGINE == "network")  # The 'interactive' profile shows the browser to see and interact with it
 
-    # - - - LOGIN - - -
+    profiler = Profiler() if PROFILING_REPORT else None
 
-    handler.action_by("class", "TopNav_login__mpeOl", "click", "Login Button")
+    handler = ActionHandler(driver, wait_time=1, profiler=profiler)
 
-    handler.action_by("name", "email", f"w-{email}", "Email Input", wait_overwrite=0.25)
-    handler.action_by("name", "password", f"w-{password}", "Password Input", wait_overwrite=0.25)
+    # - - - LOGIN - - -
 
-    handler.action_by("class", "login-btn", "click", "Login Submit Button")
+    if not login(handler, email, password, SESSION_PATH):
+        driver.quit()
+        return
 
-    print("\n____________________________________________________________\n")
+    logger.info("\n____________________________________________________________\n")
 
     # - - - COURSES & CARDSETS- - -
 
-    cardsets = get_all_cardsets(handler)
-    print(cardsets_information(cardsets))
+    catalog = CatalogCache(CATALOG_PATH, ttl=CATALOG_TTL) if CATALOG_PATH else None
+    catalog_fresh = bool(catalog and catalog.is_fresh())  # before get_all_cardsets saves a revalidated catalog
+
+    cardsets = get_all_cardsets(handler, cache=catalog)
+    logger.info(cardsets_information(cardsets))
 
-    print("\n____________________________________________________________'n")
+    logger.info("\n____________________________________________________________'n")
 
     # - - - EXPORT CARDSETS - - -
 
-    extract_cardsets(handler, cardsets)
+    index = ScrapeIndex(INDEX_PATH) if INDEX_PATH else None
+
+    # Within the TTL only new / changed cardsets and those without a complete export. After it every cardset
+    # goes through extract_cardset, which scrapes complete ones again (or with FIRST_CARD_CHECK compares their first card)
+    if catalog_fresh and index:
+        changed = {c["cardset-href"] for c in catalog.changed(cardsets)}
+        cardsets = [c for c in cardsets if c["cardset-href"] in changed or not index.is_complete(c)]
+        logger.info("🔍 %d cardsets are new, changed or not completely exported yet", len(cardsets))
+
+    if ENGINE == "network":
+        extract_cardsets_network(handler, cardsets, index, compact=COMPACT_OUTPUT)
+    elif WORKERS > 1:
+        extract_cardsets_parallel(handler, cardsets, URL, workers=WORKERS, index=index, compact=COMPACT_OUTPUT, profile=PROFILE, first_card_check=FIRST_CARD_CHECK)
+    else:
+        extract_cardsets(handler, cardsets, index, compact=COMPACT_OUTPUT, first_card_check=FIRST_CARD_CHECK)
+
+    if index:
+        index.close()
+
+    if EXPORT_PATH:
+        logger.info("✓ Exported %d cards to %s", export_account('results/data', EXPORT_PATH), EXPORT_PATH)
+
+    if profiler:
+        logger.info("✓ Saved the profiling report to %s", ', '.join(profiler.save(PROFILING_REPORT)))
     # print(extraction_information(results))
 
-    print("\n____________________________________________________________\n")
+    logger.info("\n____________________________________________________________\n")
     
     # - - - SAVE RESULTS - - -
 
@@ -48,7 +111,8 @@ def main():
 
     # - - - END - - -
 
-    input("If you hit 'Enter', the browser will close and the script will exit.")
+    if not DRIVER_PROFILES[PROFILE]["headless"]:  # Unattended runs must not wait for input
+        input("If you hit 'Enter', the browser will close and the script will exit.")
 
     driver.quit()
 
@@ -0,0 +1,97 @@
+import argparse
+import tempfile
+import random
+import time
+import sys
+import os
+
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+
+from procedures.obtain_cardsets import group_cardsets
+
+# - - - - - - - - -
+
+SIZES = [10_000, 100_000]
+COURSES = 200           # number of courses the synthetic cardsets are spread over
+SHARED = 0.3            # share of the cardsets which appear in a second course
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the cardset catalog grouping in get_all_cardsets")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Number of cardset rows")
+    parser.add_argument("--courses", type=int, default=COURSES, help="Number of courses")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'map_elements':>12} | {'native':>9} | {'speedup':>8} | {'parquet':>9}")
+    print("-" * 60)
+
+    for size in args.sizes:
+        rows = synthetic_rows(size, args.courses)
+
+        legacy_time, legacy = timed(lambda: group_legacy(rows))
+        native_time, native = timed(lambda: group_cardsets(rows))
+
+        assert same_catalog(legacy, native)
+
+        with tempfile.TemporaryDirectory() as directory:
+            parquet_time, _ = timed(lambda: group_cardsets(rows, output="lazy", parquet_path=os.path.join(directory, "catalog.parquet")))
+
+        print(f"{size:>8} | {legacy_time:>11.3f}s | {native_time:>8.3f}s | {legacy_time / native_time:>7.1f}x | {parquet_time:>8.3f}s")
+
+# - - - - - - - - -
+
+def synthetic_rows(size, courses):
+    """ Cardset rows as get_all_cardsets collects them, some cardsets are part of two courses """
+    rng = random.Random(size)
+    rows = []
+
+    for i in range(size):
+        course = rng.randrange(courses)
+        cardset = i if rng.random() > SHARED or not rows else int(rows[rng.randrange(len(rows))]["cardset-href"].rsplit("/", 1)[-1])
+
+        rows.append({
+            "course-text": f"Course {course}",
+            "course-href": f"https://buffl.co/courses/{course}",
+            "cardset-text": f"Cardset {cardset}",
+            "cardset-count": cardset % 250,
+            "cardset-href": f"https://buffl.co/learn/{cardset}"
+        })
+
+    return rows
+
+
+def same_catalog(legacy, native):
+    """ Both variants hold the same cardsets with the same courses (the legacy one in arbitrary order) """
+    def normalized(catalog):
+        return sorted(
+            (c["cardset-href"], c["cardset-text"], c["cardset-count"], tuple(sorted(c["course-text"].split("; "))), tuple(sorted(c["course-href"].split("; "))))
+            for c in catalog
+        )
+    return normalized(legacy) == normalized(native)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+# - - - - - - - - -
+
+def group_legacy(rows):
+    """ The grouping get_all_cardsets used before, calling back into Python once per group """
+    df = pl.DataFrame(rows)
+
+    grouped_df = df.group_by(["cardset-text", "cardset-href", "cardset-count"]).agg([
+        pl.col("course-text").unique().map_elements(lambda x: "; ".join(x), return_dtype=pl.String).alias("course-text"),
+        pl.col("course-href").unique().map_elements(lambda x: "; ".join(x), return_dtype=pl.String).alias("course-href")
+    ])
+
+    return grouped_df.to_dicts()
+
+# - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import hashlib
+import random
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+
+from procedures.card_store import CardStore, count_empty_fields
+
+# - - - - - - - - -
+
+SIZES = [10_000, 25_000, 50_000, 100_000]
+PASSES = 3              # passes through a cardset, every pass sees (mostly) the same cards again
+LEGACY_LIMIT = 25_000   # the quadratic legacy variant takes minutes above this
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the duplicate tracking in extract_cardsets")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Number of unique cards per cardset")
+    parser.add_argument("--passes", type=int, default=PASSES, help="Passes through the cardset")
+    parser.add_argument("--legacy-limit", type=int, default=LEGACY_LIMIT, help="Largest size the legacy variant runs for")
+    args = parser.parse_args()
+
+    print(f"{'cards':>8} | {'legacy (list)':>14} | {'CardStore':>10} | {'speedup':>8}")
+    print("-" * 50)
+
+    for size in args.sizes:
+        passes = synthetic_passes(size, args.passes)
+
+        store_time, store_results = timed(lambda: dedup_store(passes))
+
+        if size <= args.legacy_limit:
+            legacy_time, legacy_results = timed(lambda: dedup_legacy(passes))
+            assert [r["card"]["hash"] for r in legacy_results] == [r["card"]["hash"] for r in store_results]
+            print(f"{size:>8} | {legacy_time:>13.3f}s | {store_time:>9.3f}s | {legacy_time / store_time:>7.0f}x")
+        else:
+            print(f"{size:>8} | {'skipped':>14} | {store_time:>9.3f}s | {'-':>8}")
+
+# - - - - - - - - -
+
+def synthetic_passes(size, passes):
+    """ Build 'passes' lists of card results, every pass misses some cards and has some broken duplicates """
+    rng = random.Random(size)
+
+    cards = [synthetic_result(i) for i in range(size)]
+    all_passes = []
+
+    for _ in range(passes):
+        current = [c for c in cards if rng.random() > 0.02]  # ~2% of the cards are missed per pass
+        for c in rng.sample(current, k=max(1, size // 100)):  # ~1% re-appear with missing fields
+            broken = synthetic_result(int(c["card"]["question"]["text"].split()[-1]), broken=True)
+            current.append(broken)
+        all_passes.append(current)
+
+    return all_passes
+
+
+def synthetic_result(i, broken=False):
+    card = {
+        "question": {"text": "" if broken else f"Question {i}", "html": f"<div><p><span>Question {i}</span></p></div>"},
+        "answer": {"text": f"Answer {i}", "html": f"<div><p><span>Answer {i}</span></p></div>"},
+        "pictures": []
+    }
+    card["hash"] = hashlib.md5(f"{i}-{broken}".encode()).hexdigest()
+    return {"is_card": True, "type": "card", "card": card}
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+# - - - - - - - - -
+
+def dedup_store(passes):
+    total_results = CardStore()
+    for results in passes:
+        for result in results:
+            total_results.add(result)
+    return total_results.results(collapse_duplicates=True)
+
+
+def dedup_legacy(passes):
+    """ The list based merge and html re-grouping extract_cardsets used before CardStore """
+    total_results = []
+    for results in passes:
+        all_hashs = [r["card"]["hash"] for r in total_results if "hash" in r["card"]]
+        for result in results:
+            if result["card"]["hash"] not in all_hashs:
+                total_results.append(result)
+                all_hashs.append(result["card"]["hash"])
+
+    html_groups = {}
+    for result in total_results:
+        html_groups.setdefault(result["card"]["question"]["html"], []).append(result)
+
+    return [min(group, key=count_empty_fields) for group in html_groups.values()]
+
+# - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import tempfile
+import time
+import json
+import glob
+import sys
+import os
+
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+
+from procedures.card_model import export_account, load_account
+
+# - - - - - - - - -
+
+CARDS = 100_000
+CARDSETS = 400
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Loading all scraped cards: parsing the JSON files vs. the Parquet export")
+    parser.add_argument("--cards", type=int, default=CARDS, help="Number of synthetic cards")
+    parser.add_argument("--cardsets", type=int, default=CARDSETS, help="Number of cardset files they are spread over")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = os.path.join(directory, "data")
+        parquet_path = os.path.join(directory, "cards.parquet")
+
+        write_synthetic_files(data_dir, args.cards, args.cardsets)
+
+        json_time, json_cards = timed(lambda: load_json_files(data_dir))
+        export_time, exported = timed(lambda: export_account(data_dir, parquet_path))
+        load_time, frame = timed(lambda: load_account(parquet_path).collect())
+        query_time, per_type = timed(lambda: load_account(parquet_path).group_by("type").agg(pl.len()).collect())
+
+        assert len(json_cards) == exported == frame.height
+
+        print(f"Cards: {exported} in {args.cardsets} files ({os.path.getsize(parquet_path) / 1e6:.1f} MB Parquet)")
+        print(f"Parse all JSON files:          {json_time:.3f}s")
+        print(f"Export to Parquet (once):      {export_time:.3f}s")
+        print(f"Load the Parquet export:       {load_time:.3f}s ({json_time / load_time:.0f}x faster)")
+        print(f"Cards per type (lazy query):   {query_time:.3f}s -> {dict(per_type.iter_rows())}")
+
+# - - - - - - - - -
+
+def write_synthetic_files(data_dir, cards, cardsets):
+    """ Pretty printed cardset files as extract_cardset writes them, every fourth card is multiple-choice """
+    os.makedirs(data_dir)
+    per_file = -(-cards // cardsets)
+
+    for number in range(cardsets):
+        results = []
+        for i in range(number * per_file, min(cards, (number + 1) * per_file)):
+            question = {"text": f"Question {i}", "html": f"<div><p><span>Question {i}</span></p></div>"}
+            if i % 4 == 3:
+                answers = [{"text": f"Option {o}", "html": f"<p>Option {o}</p>", "is_correct": o == 0} for o in range(3)]
+                card = {"question": question, "answers": answers, "pictures": [], "hash": f"{i:032x}"}
+                results.append({"is_card": True, "type": "multiple-choice", "card": card})
+            else:
+                answer = {"text": f"Answer {i}", "html": f"<div><p><span>Answer {i}</span></p></div>"}
+                card = {"question": question, "answer": answer, "pictures": [], "hash": f"{i:032x}"}
+                results.append({"is_card": True, "type": "card", "card": card})
+
+        with open(os.path.join(data_dir, f"2025-01-01_12-00_Cardset_{number}_set{number}.json"), 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_json_files(data_dir):
+    cards = []
+    for path in glob.glob(os.path.join(data_dir, "*.json")):
+        with open(path, 'r', encoding='utf-8') as f:
+            cards.extend(json.load(f))
+    return cards
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+# - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
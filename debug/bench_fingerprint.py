@@ -0,0 +1,72 @@
+import argparse
+import hashlib
+import time
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+
+from procedures.card_fingerprint import card_fingerprint
+
+# - - - - - - - - -
+
+CARDS = 100_000
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Card hashing: json.dumps + MD5 vs. the canonical fingerprint")
+    parser.add_argument("--cards", type=int, default=CARDS, help="Number of synthetic cards")
+    args = parser.parse_args()
+
+    cards = [synthetic_card(i) for i in range(args.cards)]
+
+    legacy_time, _ = timed(lambda: [legacy_hash(card) for _, card in cards])
+    fingerprint_time, hashes = timed(lambda: [card_fingerprint(card_type, card) for card_type, card in cards])
+
+    assert len(set(hashes)) == len(cards)
+
+    # The fingerprint does not change when the image URL gets a new token or CDN host ...
+    card_type, card = cards[3]
+    before = card_fingerprint(card_type, card)
+    card["question"]["html"] = card["question"]["html"].replace("?token=a", "?token=b").replace("cdn.buffl.co", "cdn2.buffl.co")
+    assert card_fingerprint(card_type, card) == before
+
+    # ... but the same file name in another upload directory is another image
+    card["question"]["html"] = card["question"]["html"].replace("/3/image.png", "/4/image.png")
+    assert card_fingerprint(card_type, card) != before
+
+    # The rewrite to a local media path changes it, so the hash is computed before the rewrite
+    card["question"]["html"] = card["question"]["html"].split('src="')[0] + 'src="results/media/0123abcd.png"></p>\n</div>'
+    assert card_fingerprint(card_type, card) != before
+
+    print(f"Cards: {len(cards)}")
+    print(f"json.dumps + MD5:       {legacy_time:.3f}s")
+    print(f"card_fingerprint:       {fingerprint_time:.3f}s ({legacy_time / fingerprint_time:.1f}x)")
+
+# - - - - - - - - -
+
+def synthetic_card(i):
+    question = {"text": f"Question {i}", "html": f"<div>\n  <p><span>Question {i}</span><img src=\"https://cdn.buffl.co/{i}/image.png?token=a\"></p>\n</div>"}
+    if i % 4 == 3:
+        answers = [{"text": f"Option {i}.{o}", "html": f"<p>Option {i}.{o}</p>", "is_correct": o == 0} for o in range(4)]
+        return "multiple-choice", {"question": question, "answers": answers, "pictures": []}
+
+    answer = {"text": f"Answer {i}", "html": f"<div><p><span>Answer {i}</span></p></div>"}
+    return "card", {"question": question, "answer": answer, "pictures": []}
+
+
+def legacy_hash(card):
+    return hashlib.md5(json.dumps(card, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+# - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
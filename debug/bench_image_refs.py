@@ -0,0 +1,148 @@
+import argparse
+import random
+import glob
+import copy
+import json
+import time
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+
+from procedures.image_refs import find_image_refs, unique_urls, rewrite_image_refs
+
+# - - - - - - - - -
+
+CORPUS_GLOB = "results/data/*.json"  # saved cardsets, a synthetic corpus is used if there are none
+SYNTHETIC_CARDS = 20_000
+ROUNDS = 3
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the image URL extraction and rewriting in extract_and_download_pictures")
+    parser.add_argument("--corpus", default=CORPUS_GLOB, help="Glob of saved cardset JSON files")
+    parser.add_argument("--synthetic", type=int, default=SYNTHETIC_CARDS, help="Number of synthetic cards if no corpus is found")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="Rounds per variant, the best one is reported")
+    args = parser.parse_args()
+
+    cards = load_corpus(args.corpus)
+    source = f"{len(cards)} saved cards from '{args.corpus}'"
+    if not cards:
+        cards = synthetic_corpus(args.synthetic)
+        source = f"{len(cards)} synthetic cards"
+
+    # The local path every URL would be mapped to (same for both variants)
+    url_mapping = {}
+    for card in cards:
+        for url in unique_urls(find_image_refs(card)):
+            url_mapping.setdefault(url, f"results/media/{len(url_mapping):032x}.png")
+
+    print(f"Corpus: {source}, {len(url_mapping)} distinct image URLs\n")
+
+    legacy = min(timed(lambda: [rewrite_legacy(card, url_mapping) for card in cards]) for _ in range(args.rounds))
+
+    single_pass = []
+    for _ in range(args.rounds):
+        fresh = copy.deepcopy(cards)  # the single pass rewrites in place
+        single_pass.append(timed(lambda: [rewrite_single_pass(card, url_mapping) for card in fresh]))
+    single_pass = min(single_pass)
+
+    print(f"{'legacy (json dump + 5 regexes)':<34} {legacy * 1000:>9.1f} ms  {legacy / len(cards) * 1e6:>7.1f} µs/card")
+    print(f"{'single pass (image_refs)':<34} {single_pass * 1000:>9.1f} ms  {single_pass / len(cards) * 1e6:>7.1f} µs/card")
+    print(f"\nSpeedup: {legacy / single_pass:.1f}x")
+
+# - - - - - - - - -
+
+def load_corpus(pattern):
+    cards = []
+    for path in glob.glob(pattern):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cards.extend(result["card"] for result in json.load(f) if result.get("card"))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return cards
+
+
+def synthetic_corpus(size):
+    """ Cards shaped like the saved ones, roughly a third with images """
+    rng = random.Random(size)
+    cards = []
+
+    for i in range(size):
+        image = ""
+        if rng.random() < 0.33:
+            uuid = f"{rng.getrandbits(128):032x}"
+            image = (
+                '<div class="goethe-image2"><div class="image-wrapper2"><div>'
+                f'<img tabindex="0" src="https://buffl-media.s3.amazonaws.com/{uuid}.png" class="img" '
+                'style="cursor: zoom-in; opacity: 1; border-radius: 12px; width: auto;"></div></div></div>'
+            )
+        paragraphs = "".join(f"<p><span>Sentence {j} of card {i} with some explanation. </span></p>" for j in range(rng.randint(1, 6)))
+
+        if rng.random() < 0.8:
+            cards.append({
+                "question": {"text": f"Question {i}", "html": f"<div>{image}<p><span>Question {i}</span></p></div>"},
+                "answer": {"text": f"Answer {i}", "html": f"<div>{paragraphs}</div>"},
+                "pictures": []
+            })
+        else:
+            cards.append({
+                "question": {"text": f"Question {i}", "html": f"<div>{image}<p><span>Question {i}</span></p></div>"},
+                "answers": [{"text": f"Option {j}", "html": f'<div class="label">Option {j}</div>', "is_correct": j == 0} for j in range(4)],
+                "pictures": []
+            })
+
+    return cards
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+# - - - - - - - - -
+
+LEGACY_PATTERNS = [
+    r'src=\\"(https://[^"]*\\.(?:png|jpg|jpeg|gif|webp|svg)[^"]*)\\"',
+    r'src="(https://[^"]*\.(?:png|jpg|jpeg|gif|webp|svg)[^"]*)"',
+    r"src='(https://[^']*\.(?:png|jpg|jpeg|gif|webp|svg)[^']*)'",
+    r'src=(https://[^\s>]*\.(?:png|jpg|jpeg|gif|webp|svg)[^\s>]*)',
+    r'(https://[^\s"\'<>]*\.(?:png|jpg|jpeg|gif|webp|svg)(?:\?[^\s"\'<>]*)?)',
+]
+
+
+def rewrite_legacy(card, url_mapping):
+    """ What extract_and_download_pictures did before image_refs: dump, 5 regexes, list dedup, replace, load """
+    card_str = json.dumps(card, ensure_ascii=False)
+
+    all_matches = []
+    for pattern in LEGACY_PATTERNS:
+        for url in re.findall(pattern, card_str, re.IGNORECASE):
+            if url and url not in all_matches:
+                all_matches.append(url)
+
+    if not all_matches:
+        return card
+
+    for url in all_matches:
+        if url in url_mapping and url in card_str:
+            card_str = card_str.replace(url, url_mapping[url])
+
+    updated = json.loads(card_str)
+    updated["pictures"] = [url_mapping[url] for url in all_matches if url in url_mapping]
+    return updated
+
+
+def rewrite_single_pass(card, url_mapping):
+    refs = find_image_refs(card)
+    if refs:
+        rewrite_image_refs(card, refs, url_mapping)
+    return card
+
+# - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
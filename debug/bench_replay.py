@@ -0,0 +1,246 @@
+import argparse
+import tempfile
+import time
+import json
+import glob
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils_generic import ActionHandler, setup_driver
+from utils_logging import setup_logging
+from procedures.obtain_cardsets import get_all_cardsets
+from procedures.process_cardset import extract_cardsets
+from procedures.parallel_extraction import extract_cardsets_parallel
+from procedures.scrape_index import ScrapeIndex
+import procedures.process_cardset as process_cardset
+from replay_server import ReplayServer, synthetic_catalog, recorded_catalog, expand, DELAY, LOAD_DELAY, COURSES, CARDSETS, CARDS
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the scraper end to end against the offline replay server and measure it")
+    parser.add_argument("--delay", type=float, default=DELAY, help="Seconds the replayed app takes per screen")
+    parser.add_argument("--load-delay", type=float, default=LOAD_DELAY, help="Seconds the server takes to answer a course page request")
+    parser.add_argument("--courses", type=int, default=COURSES)
+    parser.add_argument("--tabs", type=int, default=1, help="Course pages get_all_cardsets loads in parallel tabs")
+    parser.add_argument("--cardsets", type=int, default=CARDSETS, help="Cardsets per course")
+    parser.add_argument("--cards", type=int, default=CARDS, help="Cards per cardset")
+    parser.add_argument("--recorded", nargs="*", default=None, help="Exported cardset files to replay instead of synthetic cards")
+    parser.add_argument("--workers", type=int, default=1, help="Browsers extracting the cardsets in parallel (extract_cardsets_parallel)")
+    parser.add_argument("--resume", type=int, default=0, help="Interrupt the first cardset after this many cards and check that the measured run only reads the missing ones")
+    parser.add_argument("--visible", action="store_true", help="Show the browser")
+    parser.add_argument("--report", default=None, help="Write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    setup_logging(os.environ.get("BUFFL_LOG_LEVEL", "INFO"))
+
+    catalog = recorded_catalog(expand(args.recorded)) if args.recorded else synthetic_catalog(args.courses, args.cardsets, args.cards)
+    server = ReplayServer(catalog, args.delay, load_delay=args.load_delay).start()
+
+    sleeping = SleepMeter().install()
+    driver = setup_driver(server.url, headless=not args.visible)
+    calls = CallMeter(driver).install()
+
+    handler = ActionHandler(driver, wait_time=1)
+    output_dir = tempfile.mkdtemp(prefix="buffl-replay-")
+    working_dir = os.getcwd()
+
+    index = ScrapeIndex(os.path.join(output_dir, "index.sqlite")) if args.resume else None
+    reads = ReadMeter().install()
+
+    try:
+        os.chdir(output_dir)  # extract_cardsets writes to results/data relative to the working directory
+
+        calls.reset()
+        sleeping.reset()
+        start = time.perf_counter()
+        cardsets = get_all_cardsets(handler, tabs=args.tabs)
+        catalog_phase = calls.snapshot(time.perf_counter() - start, sleeping.total)
+
+        if args.resume:
+            interrupt(index, args.resume)
+            try:
+                extract_cardsets(handler, cardsets[:1], index)
+            except Interrupted:
+                pass
+            resume(index)
+
+        calls.reset()
+        sleeping.reset()
+        reads.reset()
+        start = time.perf_counter()
+        if args.workers > 1:
+            extract_cardsets_parallel(handler, cardsets, server.url, workers=args.workers, headless=not args.visible, index=index)
+        else:
+            extract_cardsets(handler, cardsets, index)
+        extract_phase = calls.snapshot(time.perf_counter() - start, sleeping.total)
+
+        scraped = 0
+        for path in glob.glob("results/data/*.json"):
+            with open(path, 'r', encoding='utf-8') as f:
+                scraped += len(json.load(f))
+
+    finally:
+        os.chdir(working_dir)
+        driver.quit()
+        server.stop()
+        sleeping.uninstall()
+        reads.uninstall()
+        if index:
+            index.close()
+
+    report = {
+        "expected_cards": server.card_count(),
+        "scraped_cards": scraped,
+        "cardsets": len(cardsets),
+        "delay": args.delay,
+        "load_delay": args.load_delay,
+        "tabs": args.tabs,
+        "workers": args.workers,
+        "resumed_cards": args.resume,
+        "card_reads": reads.count,  # cards read while walking (the first card of a cardset and clicked past ones do not count)
+        "catalog": catalog_phase,
+        "extraction": dict(extract_phase,
+            cards_per_second=round(scraped / extract_phase["seconds"], 2) if extract_phase["seconds"] else None,
+            calls_per_card=round(extract_phase["driver_calls"] / scraped, 2) if scraped else None,
+        ),
+        "waits": handler.waits.stats(),  # learned render latency per screen type
+        "output_dir": output_dir,
+    }
+
+    print("\n____________________________________________________________\n")
+    print(f"Cards:             {scraped} of {server.card_count()} in {len(cardsets)} cardsets")
+    print(f"Catalog:           {catalog_phase['seconds']:.2f}s with {args.tabs} tab(s), {catalog_phase['driver_calls']} WebDriver calls, {catalog_phase['sleeping']:.2f}s sleeping")
+    print(f"Extraction:        {extract_phase['seconds']:.2f}s, {report['extraction']['cards_per_second']} cards/s with {args.workers} browser(s)")
+    print(f"WebDriver calls:   {report['extraction']['calls_per_card']} per card ({extract_phase['driver_calls']} total{', first browser only' if args.workers > 1 else ''})")
+    print(f"Sleeping:          {extract_phase['sleeping']:.2f}s ({extract_phase['sleeping'] / extract_phase['seconds'] * 100 if extract_phase['seconds'] else 0:.0f}% of the extraction)")
+    print(f"Top commands:      {', '.join(f'{k} {v}' for k, v in list(extract_phase['commands'].items())[:5])}")
+    latencies = [f"{k} p50 {v['p50']}s / p99 {v['p99']}s" for k, v in report["waits"].items() if k in ("course", "cardset", "card", "overview")]
+    print(f"Render latency:    {', '.join(latencies)}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved the report to {args.report}")
+
+    if scraped != server.card_count():
+        print("⚠️ Not all replayed cards were scraped!")
+
+    if args.resume:
+        print(f"Resumed:           {reads.count} cards read after {args.resume} were checkpointed")
+        assert reads.count == server.card_count() - args.resume, "the resumed run read cards it already had"
+
+# - - - RESUMING - - -
+
+class Interrupted(Exception):
+    """ Stands in for a crash of the run """
+
+
+def interrupt(index: ScrapeIndex, after):
+    """ Let the index raise Interrupted once 'after' cards were checkpointed """
+    checkpoint = index.checkpoint_card
+    saved = 0
+
+    def interrupted(cardset, result, position):
+        nonlocal saved
+        if saved >= after:
+            raise Interrupted()
+        checkpoint(cardset, result, position)
+        saved += 1
+
+    index.checkpoint_card = interrupted
+
+
+def resume(index: ScrapeIndex):
+    del index.checkpoint_card  # back to the method of the class
+    index.connection.commit()
+
+# - - - MEASUREMENT - - -
+
+class CallMeter:
+    """ Counts the WebDriver commands (every round trip to the browser goes through driver.execute) """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.commands = {}
+
+
+    def install(self):
+        execute = self.driver.execute
+
+        def counted(command, params=None):
+            self.commands[command] = self.commands.get(command, 0) + 1
+            return execute(command, params)
+
+        self.driver.execute = counted
+        return self
+
+
+    def reset(self):
+        self.commands = {}
+
+
+    def snapshot(self, seconds, sleeping):
+        commands = dict(sorted(self.commands.items(), key=lambda item: -item[1]))
+        return {"seconds": round(seconds, 3), "driver_calls": sum(commands.values()), "sleeping": round(sleeping, 3), "commands": commands}
+
+
+class SleepMeter:
+    """ Sums up the time spent in time.sleep (fixed waits of the scraper) """
+
+    def __init__(self):
+        self.total = 0.0
+        self.original = time.sleep
+
+
+    def install(self):
+        def measured(seconds):
+            start = time.perf_counter()
+            self.original(seconds)
+            self.total += time.perf_counter() - start
+
+        time.sleep = measured
+        return self
+
+
+    def uninstall(self):
+        time.sleep = self.original
+
+
+    def reset(self):
+        self.total = 0.0
+
+
+class ReadMeter:
+    """ Counts the cards read while walking a cardset (find_goethe_elements on the card screen) """
+
+    def __init__(self):
+        self.count = 0
+        self.original = process_cardset.find_goethe_elements
+
+
+    def install(self):
+        def counted(handler, downloader=None, screen="card", *args, **kwargs):
+            rsp = self.original(handler, downloader, screen, *args, **kwargs)
+            if screen == "card" and rsp["is_card"]:
+                self.count += 1
+            return rsp
+
+        process_cardset.find_goethe_elements = counted
+        return self
+
+
+    def uninstall(self):
+        process_cardset.find_goethe_elements = self.original
+
+
+    def reset(self):
+        self.count = 0
+
+# - - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 import time
 
 from utils_generic import setup_driver
+from utils_logging import setup_logging
 
 # - - - - - - - - -
 
@@ -11,6 +12,8 @@ URL = "https://buffl.co"  # Replace with your target URL
 # - - - - - - - - - -
 
 def main():
+    setup_logging()
+
     driver = setup_driver(URL, headless=False)  # Set headless=False to see and interact with the browser
 
     continue_scraping = True
@@ -0,0 +1,42 @@
+import argparse
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from anywhere
+
+from procedures.network_capture import load_har, add_payload, repeated_results
+from procedures.card_store import CardStore
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Map the JSON responses of a recorded HAR file to cards, as the network engine does")
+    parser.add_argument("har", help="HAR file recorded while opening a cardset (DevTools > Network > Save all as HAR)")
+    parser.add_argument("--url-filter", default=None, help="Only use responses whose URL contains this")
+    parser.add_argument("--output", default=None, help="Write the mapped cards to this JSON file")
+    args = parser.parse_args()
+
+    cards = CardStore()
+    repeats = {}
+
+    for url, payload in load_har(args.har, args.url_filter):
+        new = add_payload(cards, repeats, payload)
+        print(f"{new:>5} cards <- {url}")
+
+    results = repeated_results(cards, repeats)
+    types = {}
+    for result in results:
+        types[result["type"]] = types.get(result["type"], 0) + 1
+
+    print(f"\n✓ {len(results)} cards found: {types}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Saved the cards to {args.output}")
+
+# - - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
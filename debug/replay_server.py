@@ -0,0 +1,239 @@
+import argparse
+import threading
+import time
+import glob
+import json
+import os
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# - - - - - - - - -
+
+DELAY = 0.15            # seconds the replayed app takes to render the next screen
+LOAD_DELAY = 0.0        # seconds the server takes to answer a course page request (a slow page load, unlike DELAY)
+COURSES = 2
+CARDSETS = 2            # per course
+CARDS = 20              # per cardset
+MC_EVERY = 4            # every n-th synthetic card is a multiple-choice question
+
+# Single page app mimicking the screens of buffl.co the scraper relies on:
+# course navigation (main-nav-link), course page (rlg-col / learn-btn), cards (goethe-container,
+# mcoptions-select-item, flip, btn-icon-only), overview (diagram-box / all-courses-col) and end (empty-state-wrapper)
+APP_TEMPLATE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>buffl replay</title></head>
+<body>
+<nav id="nav"></nav>
+<main id="main"></main>
+<script>
+const DELAY = __DELAY__;
+const DATA = __DATA__;
+
+const main = document.getElementById('main');
+const later = (render) => setTimeout(render, DELAY);
+const escape = (text) => String(text).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+
+document.getElementById('nav').innerHTML = DATA.courses.map((course, i) =>
+    `<a class="main-nav-link" href="/course/${i}">${escape(course.name)}</a>`).join(' ');
+
+const cardsets = {};
+DATA.courses.forEach(course => course.cardsets.forEach(cardset => { cardsets[cardset.id] = cardset; }));
+
+const path = location.pathname.split('/').filter(Boolean);
+
+// - - - COURSE PAGE - - -
+
+if (path[0] === 'course') {
+    const course = DATA.courses[Number(path[1])];
+    later(() => {
+        main.innerHTML = course.cardsets.length === 0
+            ? '<div class="empty-state-wrapper">No cardsets</div>'
+            : course.cardsets.map(c => `
+                <div class="rlg-col"><div>${escape(c.name)}</div><div>${c.cards.length} Cards</div></div>
+                <a class="learn-btn" href="/learn/${c.id}">Learn</a>`).join('');
+    });
+}
+
+// - - - CARDSET (learning) PAGE - - -
+
+if (path[0] === 'learn') {
+    const cards = cardsets[path[1]].cards;
+    const state = {screen: 'card', index: Math.min(1, cards.length - 1), revealed: false};  // the app resumes at a later card
+
+    const icons = Array.from({length: 6}, (_, i) => `<button class="btn-icon-only" data-icon="${i + 1}">${i + 1}</button>`).join('');
+
+    const render = () => {
+        if (state.screen === 'overview') {
+            main.innerHTML = '<div class="diagram-box">Overview</div><div class="all-courses-col">Learn all cards</div>';
+        } else if (state.screen === 'end' || state.index >= cards.length) {
+            main.innerHTML = '<div class="empty-state-wrapper">All cards done</div>';
+        } else {
+            const result = cards[state.index];
+            const card = result.card;
+            if (result.type === 'multiple-choice') {
+                const options = card.answers.map(a =>
+                    `<div class="mcoptions-select-item${state.revealed && a.is_correct ? ' correct' : ''}">${a.html}</div>`).join('');
+                main.innerHTML = `<div class="goethe-container">${card.question.html}</div>${options}<button class="flip">Check</button>${icons}`;
+            } else {
+                main.innerHTML = `<div class="goethe-container">${card.question.html}</div><div class="goethe-container">${card.answer.html}</div>${icons}`;
+            }
+        }
+    };
+
+    document.addEventListener('click', (event) => {
+        const target = event.target;
+        const result = cards[state.index];
+
+        if (target.classList.contains('all-courses-col')) {
+            Object.assign(state, {screen: 'card', index: 0, revealed: false});
+        } else if (target.classList.contains('flip')) {
+            if (!state.revealed) state.revealed = true;  // first click marks the correct options
+            else Object.assign(state, {index: state.index + 1, revealed: false});
+        } else if (target.dataset.icon === '4') {
+            state.screen = 'overview';
+        } else if (target.dataset.icon === '5' && result && result.type === 'card') {
+            state.index += 1;
+        } else {
+            return;
+        }
+        later(render);
+    });
+
+    later(render);
+}
+</script>
+</body></html>
+"""
+
+# - - - - - - - - - -
+
+class ReplayServer:
+    """
+    Local HTTP server replaying the buffl.co screens for a fixed catalog of cardsets, without any network
+
+    Every path serves the same page, which renders the screen for its URL and scripts the transitions
+    on the clicks the scraper does, each after 'delay' seconds.
+    """
+
+    def __init__(self, catalog, delay=DELAY, port=0, load_delay=LOAD_DELAY):
+        """
+        Args:
+            catalog: {'courses': [{'name', 'cardsets': [{'id', 'name', 'cards': [results]}]}]}, see synthetic_catalog / recorded_catalog
+            delay: Seconds until the next screen is rendered (default: 0.15)
+            port: Port to listen on, 0 picks a free one
+            load_delay: Seconds until a course page request is answered, the browser's navigation is pending meanwhile (default: 0)
+        """
+        self.catalog = catalog
+
+        page = APP_TEMPLATE.replace("__DELAY__", str(int(delay * 1000))).replace(
+            "__DATA__", json.dumps(catalog, ensure_ascii=False).replace("</", "<\\/")
+        ).encode('utf-8')
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/favicon.ico":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if load_delay and self.path.startswith("/course/"):
+                    time.sleep(load_delay)  # requests are answered in parallel threads, only the browser can serialize them
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, *args):
+                pass  # keep the benchmark output clean
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = None
+
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+
+    def card_count(self):
+        return sum(len(c["cards"]) for course in self.catalog["courses"] for c in course["cardsets"])
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# - - - CATALOGS - - -
+
+def synthetic_catalog(courses=COURSES, cardsets=CARDSETS, cards=CARDS, mc_every=MC_EVERY):
+    """ Catalog of distinct synthetic cards, every 'mc_every'-th one is a multiple-choice question """
+    catalog = {"courses": []}
+    number = 0
+
+    for course in range(courses):
+        entry = {"name": f"Course {course}", "cardsets": []}
+
+        for cardset in range(cardsets):
+            results = []
+            for card in range(cards):
+                number += 1
+                question = {"text": f"Question {number}", "html": f"<p><span>Question {number}</span></p>"}
+
+                if mc_every and card % mc_every == mc_every - 1:
+                    answers = [{"text": f"Option {number}.{o}", "html": f"<p>Option {number}.{o}</p>", "is_correct": o == 0} for o in range(3)]
+                    results.append({"is_card": True, "type": "multiple-choice", "card": {"question": question, "answers": answers}})
+                else:
+                    answer = {"text": f"Answer {number}", "html": f"<p><span>Answer {number}</span></p>"}
+                    results.append({"is_card": True, "type": "card", "card": {"question": question, "answer": answer}})
+
+            entry["cardsets"].append({"id": f"{course}-{cardset}", "name": f"Cardset {course}-{cardset}", "cards": results})
+
+        catalog["courses"].append(entry)
+
+    return catalog
+
+
+def recorded_catalog(paths):
+    """ Catalog of one course replaying exported cardsets (the .json files in results/data) """
+    entry = {"name": "Recorded", "cardsets": []}
+
+    for i, path in enumerate(paths):
+        with open(path, 'r', encoding='utf-8') as f:
+            results = [r for r in json.load(f) if r.get("is_card")]
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        entry["cardsets"].append({"id": f"recorded-{i}", "name": name, "cards": results})
+
+    return {"courses": [entry]}
+
+
+def expand(patterns):
+    """ File paths matching the given glob patterns """
+    return [path for pattern in patterns for path in sorted(glob.glob(pattern))]
+
+# - - - - - - - - - -
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the replayed buffl.co screens to click through manually")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--delay", type=float, default=DELAY, help="Seconds until the next screen renders")
+    parser.add_argument("--recorded", nargs="*", default=None, help="Exported cardset files to replay (default: synthetic cards)")
+    args = parser.parse_args()
+
+    catalog = recorded_catalog(expand(args.recorded)) if args.recorded else synthetic_catalog()
+    server = ReplayServer(catalog, args.delay, args.port)
+
+    print(f"✓ Replaying {server.card_count()} cards on {server.url} (Ctrl+C to stop)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
+
+# - - - - - - - - - -
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import hashlib
+
+from procedures.image_refs import IMAGE_URL_PATTERN
+
+SEPARATOR = "\x1f"  # between fields, so ('ab', 'c') and ('a', 'bc') differ
+
+# - - - - - - - - - -
+
+def card_fingerprint(card_type, card):
+    """
+    Stable hash of a card's content, computed the same way for both card types
+
+    The hash is built over the normalized text and html of the question and the answer (or every option
+    with its correctness), 'pictures' and 'hash' are ignored. Whitespace is collapsed and image URLs are
+    reduced to their path (signed query strings and CDN hosts change between sessions, the path tells
+    the uploads apart - the same file name is used in several upload directories).
+    Compute it before the image URLs are rewritten to local media paths, a rewritten card hashes differently.
+
+    Args:
+        card_type: 'card' or 'multiple-choice'
+        card: Card dictionary as built by extract_card / extract_multiple_choice
+
+    Returns:
+        Hex digest (32 characters)
+    """
+    parts = [card_type]
+    add_content(parts, card.get("question"))
+
+    if card_type == "multiple-choice":
+        for option in card.get("answers") or []:
+            add_content(parts, option)
+            parts.append("1" if option.get("is_correct") else "0")
+    else:
+        add_content(parts, card.get("answer"))
+
+    return hashlib.blake2b(SEPARATOR.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def add_content(parts, content):
+    """ Append the normalized text and html of one {'text', 'html'} field """
+    content = content or {}
+    parts.append(normalize_text(content.get("text")))
+    parts.append(normalize_html(content.get("html")))
+
+
+def image_path(match):
+    """ 'https://host/upload/name.png?token=...' -> '<image:/upload/name.png>' """
+    url = match.group(0).split('?', 1)[0]
+    return f"<image:/{url[len('https://'):].split('/', 1)[-1]}>"
+
+
+def normalize_text(text):
+    return " ".join(text.split()) if text else ""
+
+
+def normalize_html(html):
+    if not html:
+        return ""
+
+    # The pattern only runs if there can be a match, most fields have no images
+    if "https://" in html:
+        html = IMAGE_URL_PATTERN.sub(image_path, html)
+
+    return normalize_text(html).replace("> <", "><")
+
+
+def cardset_fingerprint(card_hashes):
+    """ Hash of a cardset's content, independent of the order its cards were collected in (see CardsetRegistry) """
+    return hashlib.blake2b(SEPARATOR.join(sorted(card_hashes)).encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,169 @@
+from dataclasses import dataclass, field
+import glob
+import json
+import os
+
+import polars as pl
+
+# - - - - - - - - - -
+
+@dataclass(slots=True)
+class Content:
+    """ Text and html of a question or answer """
+    text: str = ""
+    html: str = ""
+
+
+@dataclass(slots=True)
+class Option:
+    """ One option of a multiple-choice question """
+    text: str = ""
+    html: str = ""
+    is_correct: bool = False
+
+
+@dataclass(slots=True)
+class Card:
+    """
+    Typed view of a card result as produced by find_goethe_elements ({'is_card', 'type', 'card'})
+
+    Regular cards have an 'answer', multiple-choice cards their 'options' instead.
+    """
+    type: str
+    hash: str
+    question: Content
+    answer: Content = None
+    options: list = field(default_factory=list)
+    pictures: list = field(default_factory=list)
+
+
+    @classmethod
+    def from_result(cls, result):
+        card = result["card"]
+        answer = card.get("answer")
+
+        return cls(
+            type=result["type"],
+            hash=card.get("hash", ""),
+            question=Content(card["question"].get("text", ""), card["question"].get("html", "")),
+            answer=Content(answer.get("text", ""), answer.get("html", "")) if answer else None,
+            options=[Option(o.get("text", ""), o.get("html", ""), bool(o.get("is_correct"))) for o in card.get("answers") or []],
+            pictures=list(card.get("pictures") or []),
+        )
+
+# - - - COLUMNAR EXPORT - - -
+
+CARD_SCHEMA = {
+    "cardset_id": pl.String,    # last part of the cardset href
+    "source": pl.String,        # file in results/data the card was read from
+    "type": pl.String,
+    "hash": pl.String,
+    "question_text": pl.String,
+    "question_html": pl.String,
+    "answer_text": pl.String,   # null for multiple-choice cards
+    "answer_html": pl.String,
+    "options": pl.List(pl.Struct({"text": pl.String, "html": pl.String, "is_correct": pl.Boolean})),
+    "pictures": pl.List(pl.String),
+}
+
+
+def export_account(data_dir="results/data", path="results/cards.parquet"):
+    """
+    Collect every exported cardset (.json and .jsonl files) into one Parquet file
+
+    Only the newest file per cardset is used, as every run writes a new timestamped file.
+
+    Args:
+        data_dir: Directory of the cardset files (default: 'results/data')
+        path: Parquet file to write (default: 'results/cards.parquet')
+
+    Returns:
+        Number of exported cards
+    """
+    # Built column-wise, the nested options and pictures as flat tables grouped by polars afterwards
+    # (converting Python lists of dictionaries to list / struct columns is orders of magnitude slower)
+    columns = {name: [] for name in CARD_SCHEMA if name not in ("options", "pictures")}
+    options = {"row": [], "text": [], "html": [], "is_correct": []}
+    pictures = {"row": [], "picture": []}
+
+    for source in newest_cardset_files(data_dir):
+        cardset_id = os.path.splitext(os.path.basename(source))[0].rsplit("_", 1)[-1]
+
+        for result in read_results(source):
+            if not result.get("is_card"):
+                continue
+
+            card = Card.from_result(result)
+            row = len(columns["hash"])
+
+            columns["cardset_id"].append(cardset_id)
+            columns["source"].append(os.path.basename(source))
+            columns["type"].append(card.type)
+            columns["hash"].append(card.hash)
+            columns["question_text"].append(card.question.text)
+            columns["question_html"].append(card.question.html)
+            columns["answer_text"].append(card.answer.text if card.answer else None)
+            columns["answer_html"].append(card.answer.html if card.answer else None)
+
+            for option in card.options:
+                options["row"].append(row)
+                options["text"].append(option.text)
+                options["html"].append(option.html)
+                options["is_correct"].append(option.is_correct)
+
+            for picture in card.pictures:
+                pictures["row"].append(row)
+                pictures["picture"].append(picture)
+
+    option_lists = pl.DataFrame(options, schema={"row": pl.UInt32, "text": pl.String, "html": pl.String, "is_correct": pl.Boolean}) \
+        .group_by("row").agg(pl.struct("text", "html", "is_correct").alias("options"))
+    picture_lists = pl.DataFrame(pictures, schema={"row": pl.UInt32, "picture": pl.String}) \
+        .group_by("row").agg(pl.col("picture").alias("pictures"))
+
+    cards = (
+        pl.DataFrame(columns, schema={name: dtype for name, dtype in CARD_SCHEMA.items() if name in columns})
+        .with_row_index("row")
+        .join(option_lists, on="row", how="left", maintain_order="left")
+        .join(picture_lists, on="row", how="left", maintain_order="left")
+        .with_columns(
+            pl.col("options").fill_null(pl.lit([], dtype=CARD_SCHEMA["options"])),
+            pl.col("pictures").fill_null(pl.lit([], dtype=CARD_SCHEMA["pictures"]))
+        )
+        .select(list(CARD_SCHEMA))
+    )
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    cards.write_parquet(temporary_path)
+    os.replace(temporary_path, path)
+
+    return cards.height
+
+
+def load_account(path="results/cards.parquet"):
+    """ Lazily scan the exported cards, only the columns and rows a query needs are read """
+    return pl.scan_parquet(path)
+
+# - - - UTILITY - - -
+
+def newest_cardset_files(data_dir):
+    """
+    Newest output file per cardset (file names are '<timestamp>_<name>_<cardset id>.json[l]')
+
+    Cardsets still being scraped (or whose run died) only have a '.jsonl.part' stream file, which is not matched.
+    """
+    newest = {}
+
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.json")) + glob.glob(os.path.join(data_dir, "*.jsonl"))):
+        cardset_id = os.path.splitext(os.path.basename(path))[0].rsplit("_", 1)[-1]
+        newest[cardset_id] = path  # sorted by name, so the latest timestamp wins
+
+    return sorted(newest.values())
+
+
+def read_results(path):
+    """ Results of a .json array or a .jsonl file """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
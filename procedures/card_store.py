@@ -0,0 +1,115 @@
+import hashlib
+
+class CardStore:
+    """
+    Collected card results of a cardset with O(1) duplicate detection
+
+    Results are unique by their card hash. Additionally the best result per question html is tracked
+    (fewest empty fields wins, see count_empty_fields), as duplicates with a different hash can
+    appear when fields are missing - but the html is always the same.
+
+    With keep_results=False only hashes are kept (e.g. when the results are streamed to disk),
+    'best_hashes' then tells which results survive the duplicate check.
+    """
+
+    def __init__(self, results=(), keep_results=True):
+        self.keep_results = keep_results
+        self.empty_fields = {}  # card hash -> number of empty fields, in the order they were added
+        self.by_hash = {}       # card hash -> result (only with keep_results)
+        self.best_by_html = {}  # digest of the question html -> card hash of the best result for that question
+
+        for result in results:
+            self.add(result)
+
+
+    def __len__(self):
+        return len(self.empty_fields)
+
+
+    def __contains__(self, card_hash):
+        return card_hash in self.empty_fields
+
+
+    def add(self, result):
+        """
+        Add a card result unless its hash is already known
+
+        Returns:
+            True if the result was new, False otherwise
+        """
+        card_hash = result["card"]["hash"]
+
+        if card_hash in self.empty_fields:
+            return False
+
+        self.empty_fields[card_hash] = count_empty_fields(result)
+        if self.keep_results:
+            self.by_hash[card_hash] = result
+
+        try:
+            key = hashlib.blake2b(result["card"]["question"]["html"].encode('utf-8'), digest_size=16).digest()
+        except (KeyError, TypeError, AttributeError):
+            key = ("hash", card_hash)  # Handle malformed results by treating them as unique
+
+        best_hash = self.best_by_html.get(key)
+        if best_hash is None or self.empty_fields[card_hash] < self.empty_fields[best_hash]:
+            self.best_by_html[key] = card_hash
+
+        return True
+
+
+    def hashes(self):
+        """ Set of all card hashes """
+        return set(self.empty_fields)
+
+
+    def best_hashes(self):
+        """ Set of the card hashes which survive the duplicate check (best result per question html) """
+        return set(self.best_by_html.values())
+
+
+    def results(self, collapse_duplicates=False):
+        """
+        Get the stored results (only with keep_results)
+
+        Args:
+            collapse_duplicates: Keep only the best result per question html (default: False)
+
+        Returns:
+            List of results in the order they were first seen
+        """
+        if not self.keep_results:
+            raise ValueError("CardStore was created with keep_results=False")
+
+        if not collapse_duplicates:
+            return list(self.by_hash.values())
+
+        return [self.by_hash[card_hash] for card_hash in self.best_by_html.values()]
+
+# - - - UTILITY - - -
+
+def count_empty_fields(res):
+    """Counts how many important fields are empty in a result."""
+    card = res.get('card', {})
+    if not card:
+        return float('inf')  # Should be heavily penalized
+
+    count = 0
+    # Check question text
+    if not card.get('question', {}).get('text'):
+        count += 1
+
+    # Check answer text(s)
+    if res.get('type') == 'card':
+        if not card.get('answer', {}).get('text'):
+            count += 1
+    elif res.get('type') == 'multiple-choice':
+        answers = card.get('answers', [])
+        if not answers or all(not ans.get('text') for ans in answers):
+            count += 1
+
+    # Check for pictures
+    if res.get('pictures') is None:
+        count += 1
+
+    return count
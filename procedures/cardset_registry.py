@@ -0,0 +1,126 @@
+import threading
+import sqlite3
+import shutil
+import json
+import time
+import os
+
+from procedures.card_fingerprint import cardset_fingerprint
+
+class CardsetRegistry:
+    """
+    SQLite registry of exported cardsets shared by several accounts (keyed by cardset-href and content fingerprint)
+
+    A public or shared cardset shows up in the catalog of every account which uses it. Once one account
+    exported it, the others take over that file instead of writing it again - as long as the export is
+    younger than 'window' and has exactly the cards they see (the same fingerprint).
+    """
+
+    def __init__(self, path="results/accounts/registry.sqlite", window=24 * 60 * 60):
+        """
+        Args:
+            path: Location of the SQLite file (default: 'results/accounts/registry.sqlite')
+            window: Seconds an export is reused by other accounts (default: 24 hours)
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.window = window
+        self.lock = threading.Lock()  # one connection shared by all accounts of a batch
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+
+            CREATE TABLE IF NOT EXISTS exports (
+                href TEXT,
+                fingerprint TEXT,
+                count INTEGER,
+                hashes TEXT,
+                output_path TEXT,
+                source TEXT,
+                exported_at REAL,
+                PRIMARY KEY (href, fingerprint)
+            );
+        """)
+        self.connection.commit()
+
+
+    def register(self, cardset, output_path, card_hashes, source=None):
+        """
+        Remember a complete export of a cardset
+
+        Args:
+            cardset: Cardset dictionary as returned by get_all_cardsets
+            output_path: The written cardset file
+            card_hashes: Hashes of the cards in the file
+            source: Optional name of the account which exported it
+        """
+        card_hashes = sorted(set(card_hashes))
+
+        with self.lock:
+            self.connection.execute("""
+                INSERT INTO exports (href, fingerprint, count, hashes, output_path, source, exported_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(href, fingerprint) DO UPDATE SET
+                    count = excluded.count, output_path = excluded.output_path, source = excluded.source, exported_at = excluded.exported_at
+            """, (cardset["cardset-href"], cardset_fingerprint(card_hashes), cardset["cardset-count"], json.dumps(card_hashes),
+                  output_path, source, time.time()))
+            self.connection.commit()
+
+
+    def lookup(self, cardset, card_hashes):
+        """
+        Find the newest export within the window with the cardset's count and exactly the cards of 'card_hashes'
+
+        All cards have to be known (network engine), a single card says nothing about the others, which
+        may differ between accounts.
+
+        Returns:
+            {'fingerprint', 'output_path', 'source', 'hashes'} or None
+        """
+        fingerprint = cardset_fingerprint(sorted(set(card_hashes)))
+
+        with self.lock:
+            row = self.connection.execute("""
+                SELECT hashes, output_path, source FROM exports
+                WHERE href = ? AND fingerprint = ? AND count = ? AND exported_at >= ?
+            """, (cardset["cardset-href"], fingerprint, cardset["cardset-count"], time.time() - self.window)).fetchone()
+
+        if not row or not os.path.exists(row[1]):
+            return None
+
+        return {"fingerprint": fingerprint, "output_path": row[1], "source": row[2], "hashes": set(json.loads(row[0]))}
+
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+# - - - UTILITY - - -
+
+def link_export(source_path, base_path):
+    """
+    Put a registered export at 'base_path' (without extension) of another account
+
+    Exports are never modified after they were written, so a hard link is enough; a copy is made where
+    that is not possible (e.g. another file system).
+
+    Returns:
+        Path of the linked file
+    """
+    path = base_path + os.path.splitext(source_path)[1]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    if os.path.abspath(path) == os.path.abspath(source_path):
+        return path
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    try:
+        os.link(source_path, path)
+    except OSError:
+        shutil.copyfile(source_path, path)
+
+    return path
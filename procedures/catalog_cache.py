@@ -0,0 +1,95 @@
+import json
+import time
+import os
+
+from utils_logging import get_logger
+
+logger = get_logger("catalog")
+
+class CatalogCache:
+    """
+    Persisted catalog of courses and their cardsets
+
+    Within the TTL the catalog is used as is. After it, the catalog is revalidated cheaply: only the
+    course navigation (with its count badges) is read and only courses whose badge changed are crawled again.
+    """
+
+    def __init__(self, path="results/catalog.json", ttl=24 * 60 * 60):
+        """
+        Args:
+            path: Location of the catalog file (default: 'results/catalog.json')
+            ttl: Seconds the catalog is trusted without any revalidation (default: 24 hours)
+        """
+        self.path = path
+        self.ttl = ttl
+
+        self.data = {"saved_at": 0, "courses": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (ValueError, OSError) as e:
+                logger.warning("⚠️ Could not read the cardset catalog, it is rebuilt: %s", e)
+
+        # cardset-href -> cardset-count of the catalog before this run, to tell what changed
+        self.previous_counts = {
+            row["cardset-href"]: row["cardset-count"]
+            for course in self.data["courses"].values() for row in course["cardsets"]
+        }
+
+
+    def is_fresh(self):
+        """ Whether the catalog is within its TTL """
+        return bool(self.data["courses"]) and time.time() - self.data["saved_at"] < self.ttl
+
+
+    def cached_rows(self):
+        """ All cached cardset rows (one per cardset and course) """
+        return [row for course in self.data["courses"].values() for row in course["cardsets"]]
+
+
+    def unchanged_course(self, course):
+        """
+        Cached cardset rows of a course if its navigation entry (text and count badge) did not change, None otherwise
+
+        A course without a count badge is always crawled again, its text alone does not tell whether cardsets were added.
+        """
+        if course.get("badge") is None:
+            return None
+
+        cached = self.data["courses"].get(course["course-href"])
+
+        if cached and cached["course-text"] == course["course-text"] and cached["badge"] == course["badge"]:
+            return cached["cardsets"]
+
+        return None
+
+
+    def save(self, courses, rows):
+        """
+        Persist the catalog
+
+        Args:
+            courses: Course dictionaries (course-text, course-href, badge) of the navigation
+            rows: Cardset rows (one per cardset and course) of those courses
+        """
+        by_course = {course["course-href"]: {"course-text": course["course-text"], "badge": course["badge"], "cardsets": []} for course in courses}
+
+        for row in rows:
+            if row["course-href"] in by_course:
+                by_course[row["course-href"]]["cardsets"].append(row)
+
+        self.data = {"saved_at": time.time(), "courses": by_course}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(temporary_path, self.path)
+
+
+    def changed(self, cardsets):
+        """
+        Cardsets which are new or whose card count differs from the catalog before this run
+        """
+        return [c for c in cardsets if self.previous_counts.get(c["cardset-href"]) != c["cardset-count"]]
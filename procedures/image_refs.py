@@ -0,0 +1,95 @@
+import re
+
+# One precompiled pattern for every image URL in the card html (src="...", src='...', src=... or plain),
+# ending at the first character which can not be part of an attribute value
+IMAGE_URL_PATTERN = re.compile(r'''https://[^\s"'<>]*\.(?:png|jpg|jpeg|gif|webp|svg)(?:\?[^\s"'<>]*)?''', re.IGNORECASE)
+
+
+class ImageRef:
+    """ A single occurrence of an image URL within one html field of a card """
+
+    __slots__ = ("field", "key", "start", "end", "url")
+
+    def __init__(self, field, key, start, end, url):
+        self.field = field  # dictionary holding the html (e.g. card["question"])
+        self.key = key      # key of the html within that dictionary
+        self.start = start
+        self.end = end
+        self.url = url
+
+
+def html_fields(card):
+    """
+    Yield (dictionary, key) of every html field of a card ('question', 'answer' and each of 'answers')
+    """
+    for name in ("question", "answer"):
+        field = card.get(name)
+        if isinstance(field, dict) and isinstance(field.get("html"), str):
+            yield field, "html"
+
+    for field in card.get("answers") or []:
+        if isinstance(field, dict) and isinstance(field.get("html"), str):
+            yield field, "html"
+
+
+def find_image_refs(card):
+    """
+    Find all image URL occurrences in the html fields of a card in a single pass
+
+    Returns:
+        List of ImageRef in document order
+    """
+    refs = []
+    for field, key in html_fields(card):
+        for match in IMAGE_URL_PATTERN.finditer(field[key]):
+            refs.append(ImageRef(field, key, match.start(), match.end(), match.group()))
+    return refs
+
+
+def unique_urls(refs):
+    """ Unique URLs of the given references in the order they appear """
+    return list(dict.fromkeys(ref.url for ref in refs))
+
+
+def rewrite_image_refs(card, refs, url_mapping):
+    """
+    Replace the referenced URLs in place with their mapped local paths and add those to card['pictures']
+
+    Args:
+        card: Card dictionary the references were found in
+        refs: References as returned by find_image_refs (for the current content of the card)
+        url_mapping: Dictionary {url: local path}, URLs without a mapping are kept
+
+    Returns:
+        Number of replaced occurrences
+    """
+    by_field = {}
+    for ref in refs:
+        if ref.url in url_mapping:
+            by_field.setdefault((id(ref.field), ref.key), []).append(ref)
+
+    for field_refs in by_field.values():
+        field, key = field_refs[0].field, field_refs[0].key
+        html = field[key]
+
+        # Splice the html together once per field instead of repeated str.replace calls
+        parts = []
+        position = 0
+        for ref in field_refs:
+            parts.append(html[position:ref.start])
+            parts.append(url_mapping[ref.url])
+            position = ref.end
+        parts.append(html[position:])
+
+        field[key] = "".join(parts)
+
+    pictures = card.get("pictures")
+    if not isinstance(pictures, list):
+        pictures = card["pictures"] = []
+
+    for ref in refs:
+        path = url_mapping.get(ref.url)
+        if path and path not in pictures:
+            pictures.append(path)
+
+    return sum(len(field_refs) for field_refs in by_field.values())
@@ -0,0 +1,139 @@
+from selenium.webdriver.support.ui import WebDriverWait
+import json
+import time
+import os
+
+from utils_generic import ActionHandler
+from utils_logging import get_logger
+
+logger = get_logger("login")
+
+# Tells a logged in page (course navigation) apart from a logged out one (login button)
+LOGIN_STATE_SCRIPT = """
+    if (document.getElementsByClassName('main-nav-link').length > 0) return 'logged-in';
+    if (document.getElementsByClassName('TopNav_login__mpeOl').length > 0) return 'logged-out';
+    return null;
+"""
+
+def login(handler: ActionHandler, email, password, session_path=None):
+    """
+    Log in, preferably by restoring a saved session instead of going through the login form
+
+    Args:
+        handler: ActionHandler of a browser which already opened the site (see setup_driver)
+        email: Account email
+        password: Account password
+        session_path: Optional file the session is restored from and saved to after a full login
+
+    Returns:
+        True if the browser is logged in afterwards
+    """
+
+    if session_path and os.path.exists(session_path):
+        try:
+            with open(session_path, 'r', encoding='utf-8') as f:
+                apply_session(handler.driver, json.load(f))
+
+            if is_logged_in(handler):
+                logger.info("✓ Restored the saved session, skipping the login")
+                return True
+
+            logger.warning("⚠️ The saved session expired, logging in again")
+        except Exception as e:
+            logger.warning("⚠️ Could not restore the saved session: %s", e)
+
+    full_login(handler, email, password)
+
+    if not is_logged_in(handler, reload=False, wait_for_login=True):
+        logger.error("❌ Login failed!")
+        return False
+
+    if session_path:
+        save_session(handler.driver, session_path)
+        logger.info("✓ Saved the session to %s", session_path)
+
+    return True
+
+
+def full_login(handler: ActionHandler, email, password):
+    """ Go through the login form """
+
+    handler.action_by("class", "TopNav_login__mpeOl", "click", "Login Button")
+
+    handler.action_by("name", "email", f"w-{email}", "Email Input", wait_overwrite=0.25)
+    handler.action_by("name", "password", f"w-{password}", "Password Input", wait_overwrite=0.25)
+
+    handler.action_by("class", "login-btn", "click", "Login Submit Button")
+
+
+def is_logged_in(handler: ActionHandler, reload=True, wait_for_login=False, timeout=10):
+    """
+    Check the login state with one (cheap) authenticated page load
+
+    Args:
+        handler: ActionHandler of the browser to check
+        reload: Whether to reload the current page first, so restored cookies are sent (default: True)
+        wait_for_login: Keep waiting while the page looks logged out, e.g. right after submitting the form (default: False)
+        timeout: How long to wait for the page to show either state (default: 10 seconds)
+    """
+    if reload:
+        handler.driver.refresh()
+
+    def current_state(driver):
+        state = driver.execute_script(LOGIN_STATE_SCRIPT)
+        if state == "logged-out" and wait_for_login:
+            return None  # the login might still be in progress
+        return state
+
+    try:
+        state = WebDriverWait(handler.driver, timeout, poll_frequency=0.1).until(current_state)
+    except Exception:
+        return False
+
+    return state == "logged-in"
+
+# - - - SESSION - - -
+
+def read_session(driver):
+    """ Get the cookies and local storage of the current page's origin """
+    return {
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script("return Object.assign({}, window.localStorage);") or {},
+        "saved_at": time.time()
+    }
+
+
+def apply_session(driver, session):
+    """
+    Put cookies and local storage of a session into a browser, which already opened a page of the same origin
+    """
+    now = time.time()
+
+    for cookie in session.get("cookies", []):
+        if cookie.get("expiry") and cookie["expiry"] < now:
+            continue  # expired cookies are rejected anyway
+
+        cookie = dict(cookie)
+        cookie.pop("sameSite", None)  # Chrome rejects some of the values it reports itself
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            logger.warning("⚠️ Could not restore cookie '%s': %s", cookie.get('name'), e)
+
+    if session.get("local_storage"):
+        driver.execute_script("""
+            for (const [key, value] of Object.entries(arguments[0])) {
+                window.localStorage.setItem(key, value);
+            }
+        """, session["local_storage"])
+
+
+def save_session(driver, path):
+    """ Save the session to a file only the current user can read (it grants access to the account) """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        json.dump(read_session(driver), f)
+
+    os.chmod(path, 0o600)  # also restrict files which existed before
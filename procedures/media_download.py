@@ -0,0 +1,230 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+import threading
+import requests
+import base64
+
+from procedures.media_store import MediaStore
+from utils_logging import get_logger
+
+logger = get_logger("media")
+
+BROWSER = "browser"  # result of a download the session was refused (401/403) or got no image for, retried in the browser
+
+# Draws the image of a tab which opened an image URL onto a canvas and returns it as base64 PNG
+CANVAS_SCRIPT = """
+    const done = arguments[arguments.length - 1];
+    const img = document.getElementsByTagName('img')[0];
+    if (!img) { done(null); return; }
+    img.decode().then(() => {
+        const canvas = document.createElement('canvas');
+        canvas.width = img.naturalWidth;
+        canvas.height = img.naturalHeight;
+        canvas.getContext('2d').drawImage(img, 0, 0);
+        done(canvas.toDataURL().split(',')[1]);
+    }, () => done(null));
+"""
+
+class ImageDownloader:
+    """
+    Background download stage for card images
+
+    Discovered image URLs are queued with 'submit' and downloaded by a bounded thread pool over one
+    cookie-authenticated, pooled HTTP session (with retries), while the scraper keeps navigating cards.
+    Downloaded images end up in a content-addressed MediaStore. Images the session is refused (or gets
+    no image for) are loaded in the browser instead, once 'wait' is called on the thread owning it.
+    """
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+    }
+
+
+    def __init__(self, driver, store: MediaStore = None, workers=4, retries=3, timeout=10, log=False):
+        """
+        Args:
+            driver: Logged in webdriver, its cookies authenticate the downloads
+            store: MediaStore the images are saved to (default: a store in 'results/media')
+            workers: Number of parallel downloads (default: 4)
+            retries: Retries per image on connection errors and 429/5xx responses (default: 3)
+            timeout: Timeout per request in seconds (default: 10 seconds)
+            log: Whether to log every download (default: False)
+        """
+        self.store = store or MediaStore()
+        self.timeout = timeout
+        self.log = log
+
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Without a domain the cookies are sent to every host, images may be served from a CDN which needs them as well
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'])
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-download")
+        self.futures = {}  # url -> future, every URL is only downloaded once
+        self.lock = threading.Lock()
+
+
+    def submit(self, url):
+        """
+        Queue the download of 'url' (nothing is queued if it is already stored or queued)
+
+        Returns:
+            Future of the download (the already queued one if any), None if the image is stored
+        """
+        with self.lock:
+            if url not in self.futures:
+                if self.store.lookup(url):
+                    return None
+                self.futures[url] = self.executor.submit(self.download, url)
+
+            return self.futures[url]
+
+
+    def batch(self, owned=False, driver=None):
+        """
+        Track the downloads of one cardset, see DownloadBatch
+
+        Args:
+            owned: Whether closing the batch closes this downloader as well (default: False)
+            driver: Webdriver of the thread waiting for the batch, used for the browser fallback
+        """
+        return DownloadBatch(self, owned, driver)
+
+
+    def download(self, url):
+        """ Download a single image into the store, returns True on success and BROWSER if only the browser may get it """
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+
+            if response.status_code in (401, 403) or (response.status_code == 200 and not response.headers.get("Content-Type", "image/").startswith("image/")):
+                if self.log:
+                    logger.debug("Download refused (%s, %s), trying the browser later: %s", response.status_code, response.headers.get("Content-Type"), url)
+                return BROWSER
+
+            if response.status_code != 200 or not response.content:
+                if self.log:
+                    logger.warning("⚠️ Download failed (%s): %s", response.status_code, url)
+                return False
+
+            path = self.store.store(url, response.content)
+
+            if self.log:
+                logger.debug("✓ Saved: %s", path)
+            return True
+
+        except Exception as e:
+            if self.log:
+                logger.warning("⚠️ Download failed for %s: %s", url, e)
+            return False
+
+
+    def wait(self, futures: dict = None, driver=None):
+        """
+        Block until the queued downloads finished
+
+        Args:
+            futures: Optional {url: future} to wait for (default: every queued download)
+            driver: Optional webdriver of the calling thread, images the session could not get are loaded with it
+
+        Returns:
+            List of the URLs whose download failed
+        """
+        with self.lock:
+            pending = dict(self.futures if futures is None else futures)
+
+        wait(pending.values())
+
+        failed = []
+        for url, future in pending.items():
+            result = future.result()
+            if result == BROWSER and driver is not None:
+                result = self.download_in_browser(driver, url)
+            if result is not True:
+                failed.append(url)
+
+        with self.lock:
+            for url, future in pending.items():
+                if self.futures.get(url) is future:
+                    del self.futures[url]  # finished ones are in the store now, failed ones may be retried later
+
+        return failed
+
+
+    def download_in_browser(self, driver, url):
+        """ Open the image in a new tab of the logged in browser and store it from a canvas, returns True on success """
+        current_window = driver.current_window_handle
+        try:
+            driver.switch_to.new_window('tab')
+            try:
+                driver.get(url)
+                image_data = driver.execute_async_script(CANVAS_SCRIPT)
+            finally:
+                driver.close()
+                driver.switch_to.window(current_window)
+
+            if not image_data:
+                return False
+
+            path = self.store.store(url, base64.b64decode(image_data))
+
+            if self.log:
+                logger.debug("✓ Saved via the browser: %s", path)
+            return True
+
+        except Exception as e:
+            if self.log:
+                logger.warning("⚠️ Browser download failed for %s: %s", url, e)
+            return False
+
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+class DownloadBatch:
+    """
+    The downloads one cardset queued on a (possibly shared) ImageDownloader
+
+    Several browsers share one downloader; waiting on the batch only blocks on the images of this cardset
+    (including those another worker queued first) and only reports their failures.
+    """
+
+    def __init__(self, downloader: ImageDownloader, owned=False, driver=None):
+        self.downloader = downloader
+        self.store = downloader.store
+        self.owned = owned
+        self.driver = driver  # of the worker the cardset belongs to, the browser fallback runs on it
+        self.futures = {}  # url -> future of the downloads this cardset needs
+
+
+    def submit(self, url):
+        future = self.downloader.submit(url)
+        if future:
+            self.futures[url] = future
+        return future
+
+
+    def wait(self):
+        """ Block until the downloads of this batch finished, returns the URLs whose download failed """
+        failed = self.downloader.wait(self.futures, driver=self.driver)
+        self.futures = {}
+        return failed
+
+
+    def close(self):
+        """ Close the downloader if the batch owns it, a shared one is closed by whoever created it """
+        if self.owned:
+            self.downloader.close()
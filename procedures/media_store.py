@@ -0,0 +1,86 @@
+from urllib.parse import urlparse
+import threading
+import hashlib
+import json
+import os
+
+class MediaStore:
+    """
+    Content-addressed store for card images
+
+    Every image is saved once as '<digest>.<extension>', no matter under how many URLs it was uploaded.
+    The URL -> file mapping is persisted as JSON lines next to the files, so previously seen URLs are
+    resolved without any network request or hashing of files on disk.
+    """
+
+    relative_dir = "results/media"  # how the cards reference the files
+
+
+    def __init__(self, media_dir=None):
+        """
+        Args:
+            media_dir: Directory of the files (default: 'results/media' of this repository)
+        """
+        self.media_dir = media_dir or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'results', 'media')
+        os.makedirs(self.media_dir, exist_ok=True)
+
+        self.index_path = os.path.join(self.media_dir, "index.jsonl")
+        self.lock = threading.Lock()
+        self.by_url = {}     # url -> file name
+        self.by_digest = {}  # digest -> file name, identical content is stored once even if the extensions differ
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.by_url[entry["url"]] = entry["file"]
+                        self.by_digest.setdefault(entry["file"].split('.')[0], entry["file"])
+                    except (ValueError, KeyError):
+                        continue  # a line cut off by a crash
+
+
+    def lookup(self, url):
+        """
+        Returns:
+            Relative path ('results/media/<digest>.<extension>') of an already stored URL, None otherwise
+        """
+        file = self.by_url.get(url)
+        return f"{self.relative_dir}/{file}" if file else None
+
+
+    def store(self, url, content):
+        """
+        Save downloaded image content (only if no identical file exists) and remember the URL
+
+        Returns:
+            Relative path of the stored file
+        """
+        digest = hashlib.sha256(content).hexdigest()[:32]
+
+        with self.lock:
+            file = self.by_digest.setdefault(digest, f"{digest}.{self.extension(url)}")
+            path = os.path.join(self.media_dir, file)
+
+            if not os.path.exists(path):
+                # Write to a temporary file first, so a crash never leaves a half written image behind
+                temporary_path = f"{path}.{threading.get_ident()}.part"
+                with open(temporary_path, 'wb') as f:
+                    f.write(content)
+                os.replace(temporary_path, path)
+
+            if self.by_url.get(url) != file:
+                self.by_url[url] = file
+                with open(self.index_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"url": url, "file": file}) + "\n")
+
+        return f"{self.relative_dir}/{file}"
+
+    # - - - UTILITY - - -
+
+    @staticmethod
+    def extension(url):
+        """ File extension of the URL's path, 'png' if there is none """
+        name = os.path.basename(urlparse(url).path)
+        extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        return extension if extension.isalnum() and len(extension) <= 5 else 'png'
@@ -0,0 +1,367 @@
+import base64
+import html
+import json
+import time
+import re
+
+from utils_generic import ActionHandler
+from procedures.scrape_index import ScrapeIndex
+from procedures.card_store import CardStore
+from procedures.media_download import ImageDownloader
+from procedures.media_store import MediaStore
+from procedures.result_writer import CardsetWriter
+from procedures.card_fingerprint import card_fingerprint
+from procedures.cardset_registry import CardsetRegistry
+from utils_logging import get_logger
+from procedures.process_cardset import extract_cardset, extract_and_download_pictures, resolve_pictures, output_base_path, adopt_shared_export, OUTPUT_DIR
+
+logger = get_logger("network")
+
+# - - - - - - - - - -
+
+# The schema of the app's API is not documented, card objects are recognized by these keys (first match wins)
+QUESTION_KEYS = ("question", "front", "questionHtml", "question_html")
+ANSWER_KEYS = ("answer", "back", "answerHtml", "answer_html")
+OPTION_KEYS = ("answers", "options", "choices", "mcOptions")
+CORRECT_KEYS = ("is_correct", "isCorrect", "correct", "right")
+CONTENT_KEYS = ("html", "content", "value", "text")  # if a field is an object instead of an html string
+
+BREAK_PATTERN = re.compile(r"<(?:br|/p|/div|/li|/h[1-6])\b[^>]*>", re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# - - - - - - - - - -
+
+class NetworkCapture:
+    """
+    Reads the JSON responses the web app fetched, from the browser's performance log
+
+    The browser has to be started with setup_driver(..., capture_network=True), setup_driver
+    already enables the Network domain. The bodies are fetched with Network.getResponseBody.
+    """
+
+    def __init__(self, driver, url_filter=None):
+        """
+        Args:
+            driver: Chrome webdriver started with capture_network=True
+            url_filter: Optional substring a response URL has to contain (e.g. the API host)
+        """
+        self.driver = driver
+        self.url_filter = url_filter
+        self.pending = {}  # request id -> url of JSON responses whose body did not finish loading yet
+
+
+    def clear(self):
+        """ Drop everything recorded so far (e.g. before opening the next cardset) """
+        self.driver.get_log("performance")
+        self.pending.clear()
+
+
+    def responses(self):
+        """ Yield (url, payload) of the JSON responses which finished loading since the last call """
+        finished = []
+
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                if "json" in response.get("mimeType", "") and (not self.url_filter or self.url_filter in response.get("url", "")):
+                    self.pending[params["requestId"]] = response["url"]
+
+            elif method == "Network.loadingFinished" and params.get("requestId") in self.pending:
+                finished.append(params["requestId"])
+
+        for request_id in finished:
+            url = self.pending.pop(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except Exception as e:
+                logger.warning("⚠️ Could not read the response of %s: %s", url, e)
+                continue
+
+            payload = decode_body(body.get("body", ""), body.get("base64Encoded", False))
+            if payload is not None:
+                yield url, payload
+
+
+def load_har(path, url_filter=None):
+    """
+    Yield (url, payload) of the JSON responses recorded in a HAR file (DevTools > Network > Save all as HAR)
+
+    The recorded responses run through the same mapping as the live capture, see cards_from_payload.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        har = json.load(f)
+
+    for entry in har.get("log", {}).get("entries", []):
+        url = entry.get("request", {}).get("url", "")
+        content = entry.get("response", {}).get("content", {})
+
+        if "json" not in content.get("mimeType", "") or (url_filter and url_filter not in url):
+            continue
+
+        payload = decode_body(content.get("text", ""), content.get("encoding") == "base64")
+        if payload is not None:
+            yield url, payload
+
+# - - - CARD MAPPING - - -
+
+def cards_from_payload(payload):
+    """
+    Find all card objects in a JSON payload, however deep they are nested
+
+    Yields:
+        Results in the format of find_goethe_elements ({'is_card', 'type', 'card'})
+    """
+    if isinstance(payload, dict):
+        result = card_from_object(payload)
+        if result:
+            yield result
+            return
+
+        for value in payload.values():
+            yield from cards_from_payload(value)
+
+    elif isinstance(payload, list):
+        for value in payload:
+            yield from cards_from_payload(value)
+
+
+def card_from_object(obj):
+    """ Map one API object to the card dictionary extract_card / extract_multiple_choice produce, None if it is no card """
+
+    question = field_content(obj, QUESTION_KEYS)
+    if question is None:
+        return None
+
+    options = next((obj[key] for key in OPTION_KEYS if isinstance(obj.get(key), list) and obj[key]), None)
+
+    if options and all(isinstance(option, dict) for option in options):
+        answers = []
+        for option in options:
+            content = field_content(option, CONTENT_KEYS) or {"text": "", "html": ""}
+            answers.append({
+                "text": content["text"],
+                "html": content["html"],
+                "is_correct": bool(next((option[key] for key in CORRECT_KEYS if key in option), False))
+            })
+
+        card_type = "multiple-choice"
+        rsp = {"question": question, "answers": answers, "pictures": []}
+
+    else:
+        answer = field_content(obj, ANSWER_KEYS)
+        if answer is None:
+            return None
+
+        card_type = "card"
+        rsp = {"question": question, "answer": answer, "pictures": []}
+
+    # Create a unique hash from the card content
+    rsp["hash"] = card_fingerprint(card_type, rsp)
+
+    return {"is_card": True, "type": card_type, "card": rsp}
+
+
+def field_content(obj, keys):
+    """ {'text', 'html'} of the first of 'keys' which holds an html string (or an object with one), None otherwise """
+
+    for key in keys:
+        value = obj.get(key)
+
+        if isinstance(value, dict):
+            value = next((value[k] for k in CONTENT_KEYS if isinstance(value.get(k), str)), None)
+
+        if isinstance(value, str):
+            return {"text": html_to_text(value), "html": value.strip()}
+
+    return None
+
+
+def html_to_text(content):
+    """ Approximate the innerText of an html snippet """
+    text = html.unescape(TAG_PATTERN.sub("", BREAK_PATTERN.sub("\n", content)))
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def decode_body(body, base64_encoded=False):
+    """ Parse a (base64 encoded) response body, None if it is no JSON """
+    try:
+        if base64_encoded:
+            body = base64.b64decode(body).decode('utf-8')
+        return json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+# - - - EXTRACTION - - -
+
+def extract_cardsets_network(handler, all_cardsets, index: ScrapeIndex = None, compact=True, url_filter=None, output_dir=OUTPUT_DIR, store: MediaStore = None, registry: CardsetRegistry = None):
+    """ Like extract_cardsets, but every cardset is read from the API responses (see extract_cardset_network), returns the number of cards scraped """
+
+    logger.info("\nStarting to process cardsets from the network responses...")
+
+    capture = NetworkCapture(handler.driver, url_filter)
+    downloader = ImageDownloader(handler.driver, store)
+
+    counts = {"cards": 0}
+
+    for cardset in all_cardsets:
+        extract_cardset_network(handler, cardset, capture, index, downloader, compact, output_dir, registry, counts)
+
+    downloader.close()
+
+    return counts["cards"]
+
+
+def extract_cardset_network(handler: ActionHandler, cardset, capture: NetworkCapture, index: ScrapeIndex = None, downloader: ImageDownloader = None, compact=True, output_dir=OUTPUT_DIR, registry: CardsetRegistry = None, counts: dict = None):
+    """
+    Collect a cardset from the JSON the web app fetches when the cardset is opened, instead of clicking through every card
+
+    If fewer cards than expected show up in the responses, the cardset is scraped via the UI (extract_cardset).
+
+    Args:
+        handler: ActionHandler of an already logged in browser started with capture_network=True
+        cardset: Cardset dictionary as returned by get_all_cardsets
+        capture: NetworkCapture of the handler's browser
+        index: Optional ScrapeIndex to skip unchanged cardsets
+        downloader: Optional ImageDownloader shared between cardsets and workers (only the images of this cardset are waited for)
+        compact: Write the pretty printed JSON array instead of JSON lines (default: True)
+        output_dir: Directory the cardset file is saved to (default: 'results/data')
+        registry: Optional CardsetRegistry shared with other accounts, an export with the same cards is linked instead of written
+        counts: Optional dictionary, its 'cards' are increased by the cards scraped in this run
+
+    Returns:
+        Path of the written file (of the previous run if the cardset was skipped, of the linked export if it was shared)
+    """
+
+    logger.info("\nProcessing cardset: %s (network)", cardset['cardset-text'])
+
+    results = capture_cardset_cards(handler, cardset, capture)
+
+    if len(results) < cardset["cardset-count"]:
+        logger.warning("⚠️ Only %d of %d cards were found in the responses, falling back to the UI", len(results), cardset['cardset-count'])
+        return extract_cardset(handler, cardset, index, downloader, compact, output_dir=output_dir, registry=registry, counts=counts)
+
+    stored = index.begin_cardset(cardset) if index else None
+
+    if stored and stored["complete"] and stored["output_path"]:
+        if {r["card"]["hash"] for r in results} <= index.known_hashes(cardset):
+            logger.info("✓ Cardset '%s' is unchanged, keeping %s", cardset['cardset-text'], stored['output_path'])
+            return stored["output_path"]
+
+    shared = registry.lookup(cardset, {r["card"]["hash"] for r in results}) if registry else None
+    if shared:
+        output_path = adopt_shared_export(cardset, shared, index, output_dir)
+        logger.info("✓ Cardset '%s' was exported by %s, linked it to %s", cardset['cardset-text'], shared['source'], output_path)
+        return output_path
+
+    if index:
+        index.reset_cardset(cardset)
+
+    # The downloader may be shared with other workers, only the downloads of this cardset are waited for
+    downloader = (downloader or ImageDownloader(handler.driver)).batch(owned=downloader is None, driver=handler.driver)
+
+    writer = CardsetWriter(output_base_path(cardset, output_dir))
+
+    written = set()
+
+    for position, result in enumerate(results):
+        if result["card"]["hash"] in written:
+            continue  # a repeated card counts for the cardset, but is stored once (as by the UI engine)
+        written.add(result["card"]["hash"])
+
+        result["card"] = extract_and_download_pictures(handler, result["card"], downloader=downloader)
+        writer.write(result)
+
+        if index:
+            index.checkpoint_card(cardset, result, position)
+
+    failed = downloader.wait()
+    if failed:
+        logger.warning("⚠️ %d images could not be downloaded, keeping their original URLs", len(failed))
+
+    downloader.close()
+
+    output_path = writer.finish(compact=compact, transform=lambda result: resolve_pictures(result, downloader.store))
+
+    logger.info("Extracted %d cards, saved results to %s", len(written), output_path)
+
+    if index:
+        index.complete_cardset(cardset, output_path)
+
+    if registry:
+        registry.register(cardset, output_path, {r["card"]["hash"] for r in results}, source=output_dir)
+
+    if counts is not None:
+        counts["cards"] = counts.get("cards", 0) + len(written)
+
+    return output_path
+
+
+def capture_cardset_cards(handler: ActionHandler, cardset, capture: NetworkCapture, timeout=15, quiet=1.5):
+    """
+    Open a cardset and collect the cards from the responses it triggers
+
+    Args:
+        timeout: Longest time to wait for the responses (default: 15 seconds)
+        quiet: Stop this long after the last new card, even if fewer than expected arrived (default: 1.5 seconds)
+
+    Returns:
+        List of results, see repeated_results
+    """
+    capture.clear()
+    handler.driver.get(cardset["cardset-href"])
+
+    cards = CardStore()
+    repeats = {}
+    start = last_new = time.perf_counter()
+
+    while time.perf_counter() - start < timeout:
+
+        for url, payload in capture.responses():
+            if add_payload(cards, repeats, payload):
+                last_new = time.perf_counter()
+
+        if sum(repeats.values()) >= cardset["cardset-count"]:
+            break
+        if len(cards) and time.perf_counter() - last_new > quiet:
+            break
+
+        time.sleep(0.1)  # the performance log can only be polled
+
+    return repeated_results(cards, repeats)
+
+
+def add_payload(cards: CardStore, repeats: dict, payload):
+    """
+    Add the cards of one response to 'cards' and count how often each occurs in it
+
+    The same response can arrive twice (refetches, overlapping pages), so 'repeats' keeps the most
+    occurrences of a card within one response - a cardset may really hold the same card several times.
+
+    Returns:
+        Number of new cards
+    """
+    occurrences = {}
+    new = 0
+
+    for result in cards_from_payload(payload):
+        card_hash = result["card"]["hash"]
+        occurrences[card_hash] = occurrences.get(card_hash, 0) + 1
+        new += cards.add(result)
+
+    for card_hash, count in occurrences.items():
+        repeats[card_hash] = max(repeats.get(card_hash, 0), count)
+
+    return new
+
+
+def repeated_results(cards: CardStore, repeats: dict):
+    """ Results in the order they were first seen, a card repeated as often as a response held it (like the positions of the UI engine) """
+    return [result for result in cards.results() for _ in range(repeats.get(result["card"]["hash"], 1))]
@@ -1,66 +1,188 @@
 import polars as pl
+import time
+import os
 
 from utils_generic import ActionHandler
+from procedures.catalog_cache import CatalogCache
+from utils_logging import get_logger
 
-def get_all_cardsets(handler: ActionHandler):
+logger = get_logger("catalog")
 
-    # - - - Check Courses - - -
+# Column types of the cardset rows, so an empty catalog still has the full schema
+CATALOG_SCHEMA = {
+    "course-text": pl.String,
+    "course-href": pl.String,
+    "cardset-text": pl.String,
+    "cardset-count": pl.Int64,
+    "cardset-href": pl.String
+}
 
-    courses_elements = handler.get_all_by("class", "main-nav-link")
-    courses = []
+# Resolves as soon as the course page rendered its cardset tiles (or the empty state), driven by DOM mutations
+COURSE_READY_SCRIPT = """
+    const [timeout, done] = arguments;
 
-    for e in courses_elements:
-        courses.append({
-            "course-text": e.text.strip(),
-            "course-href": e.get_attribute("href")
-        })
+    const read = () => {
+        const tiles = document.getElementsByClassName('rlg-col');
+        if (tiles.length > 0) {
+            return {
+                state: 'cardsets',
+                tiles: Array.from(tiles, e => e.innerText || ''),
+                hrefs: Array.from(document.getElementsByClassName('learn-btn'), e => e.href || e.getAttribute('href'))
+            };
+        }
+        if (document.getElementsByClassName('empty-state-wrapper').length > 0) {
+            return {state: 'empty', tiles: [], hrefs: []};
+        }
+        return null;
+    };
 
-        print("- ", e.text.strip(), " -> ", e.get_attribute("href"))
+    let result = read();
+    if (result) { done(result); return; }
 
-        import time
+    const observer = new MutationObserver(() => {
+        result = read();
+        if (result) { observer.disconnect(); clearTimeout(timer); done(result); }
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true});
 
-    # - - - Check for Cardsets in the Courses
+    const timer = setTimeout(() => { observer.disconnect(); done(null); }, timeout);
+"""
+
+def get_all_cardsets(handler: ActionHandler, tabs=1, cache: CatalogCache = None, output="dicts", parquet_path=None):
+    """
+    Find all cardsets of all courses of the logged in account
+
+    Args:
+        handler: ActionHandler of a logged in browser
+        tabs: Number of course pages opened in parallel tabs, 1 visits them one after another (default: 1), see find_cardset_elements_parallel
+        cache: Optional CatalogCache, used as is within its TTL and otherwise revalidated by the course badges
+        output: 'dicts' (default), 'frame' or 'lazy', see group_cardsets
+        parquet_path: Optional file the catalog is additionally written to as Parquet
+
+    Returns:
+        Cardsets (cardset-text, cardset-href, cardset-count, course-text, course-href), as a list of dictionaries by default
+    """
+
+    if cache and cache.is_fresh():
+        logger.info("✓ Using the cached cardset catalog")
+        return group_cardsets(cache.cached_rows(), output, parquet_path)
+
+    # - - - Check Courses - - -
+
+    courses = handler.driver.execute_script("""
+        return Array.from(document.getElementsByClassName('main-nav-link'), e => {
+            const badge = e.querySelector('[class*="badge"], [class*="count"]');
+            return {
+                'course-text': (e.innerText || '').trim(),
+                'course-href': e.href || e.getAttribute('href'),
+                'badge': badge ? (badge.innerText || '').trim() : null  // no badge: the course cannot be revalidated
+            };
+        });
+    """) or []
 
     cardset_elements = []
+    courses_to_crawl = []
 
     for course in courses:
+        cached = cache.unchanged_course(course) if cache else None
 
-        handler.driver.get(course["course-href"])
+        if cached is not None:
+            logger.info("-  %s  ->  %s (unchanged)", course["course-text"], course["course-href"])
+            cardset_elements.extend(cached)
+        else:
+            logger.info("-  %s  ->  %s", course["course-text"], course["course-href"])
+            courses_to_crawl.append(course)
 
-        elements, buttons = find_cardset_elements(handler)
+    # - - - Check for Cardsets in the Courses
 
-        for i in range(len(buttons)):  # buttons as they hold the hrefs which are essential
+    for start in range(0, len(courses_to_crawl), tabs):
+        batch = courses_to_crawl[start:start + tabs]
 
-            b = buttons[i]
-            e = elements[i]
+        if tabs > 1:
+            found = find_cardset_elements_parallel(handler, [c["course-href"] for c in batch])
+        else:
+            opened = time.perf_counter()
+            handler.driver.get(batch[0]["course-href"])
+            found = [find_cardset_elements(handler, started=opened)]
 
-            texts = e.text.strip().split("\n")
+        for course, (tiles, hrefs) in zip(batch, found):
 
-            cardset_elements.append({
-                "course-text": course["course-text"],
-                "course-href": course["course-href"],
-                "cardset-text": texts[0] if texts else "",
-                "cardset-count": int(texts[1].replace(" Cards", "") if len(texts) > 1 else 0),
-                "cardset-href": b.get_attribute("href")
-            })
+            for i in range(len(hrefs)):  # buttons as they hold the hrefs which are essential
 
-    # - - - Group by cardset-text and cardset-href - - -
-    # aggreaate course-text and course-href into lists
+                texts = tiles[i].strip().split("\n") if i < len(tiles) else []
+
+                cardset_elements.append({
+                    "course-text": course["course-text"],
+                    "course-href": course["course-href"],
+                    "cardset-text": texts[0] if texts else "",
+                    "cardset-count": int(texts[1].replace(" Cards", "") if len(texts) > 1 else 0),
+                    "cardset-href": hrefs[i]
+                })
+
+    if cache:
+        cache.save(courses, cardset_elements)
+
+    return group_cardsets(cardset_elements, output, parquet_path)
+
+
+def group_cardsets(cardset_elements, output="dicts", parquet_path=None):
+    """
+    Merge cardsets which appear in several courses into one entry
+
+    Args:
+        cardset_elements: Cardset rows, one per cardset and course
+        output: 'dicts' (default), 'frame' for a polars DataFrame or 'lazy' for the LazyFrame
+        parquet_path: Optional file the grouped catalog is written to as Parquet
+
+    Returns:
+        The grouped catalog in the requested output format
+    """
+
+    if output not in ("dicts", "frame", "lazy"):
+        raise ValueError(f"Unknown catalog output '{output}', expected 'dicts', 'frame' or 'lazy'")
+
+    catalog = catalog_frame(cardset_elements)
+
+    if parquet_path:
+        os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
 
-    df = pl.DataFrame(cardset_elements)
+    if output == "lazy":
+        if parquet_path:
+            catalog.sink_parquet(parquet_path)  # runs the query once for the file, the caller decides when to collect
+        return catalog
 
-    grouped_df = df.group_by(["cardset-text", "cardset-href", "cardset-count"]).agg([
-        pl.col("course-text").unique().map_elements(lambda x: "; ".join(x)).alias("course-text"),
-        pl.col("course-href").unique().map_elements(lambda x: "; ".join(x)).alias("course-href")
-    ])
+    # The query runs once, the file is written from the collected frame
+    frame = catalog.collect()
+    if parquet_path:
+        frame.write_parquet(parquet_path)
 
-    return grouped_df.to_dicts()
+    return frame if output == "frame" else frame.to_dicts()
+
+
+def catalog_frame(cardset_elements):
+    """ Lazy grouping of the cardset rows, only native polars expressions (no Python callbacks per group) """
+
+    # - - - Group by cardset-text and cardset-href - - -
+    # aggregate course-text and course-href into "; " separated strings (in the order the courses were found)
+
+    return (
+        pl.LazyFrame(cardset_elements, schema=CATALOG_SCHEMA)
+        .group_by(["cardset-text", "cardset-href", "cardset-count"], maintain_order=True)
+        .agg(
+            pl.col("course-text").unique(maintain_order=True),
+            pl.col("course-href").unique(maintain_order=True)
+        )
+        .with_columns(
+            pl.col("course-text").list.join("; "),
+            pl.col("course-href").list.join("; ")
+        )
+    )
 
 # - - - UTILITY - - -
 
 def cardsets_information(cardsets):
     info = "\n🔍 Found the following cardsets:\n"
-    
+
     for cardset in cardsets:
         info += (
             f"\nCardset: {cardset['cardset-text']}\n"
@@ -72,29 +194,73 @@ def cardsets_information(cardsets):
     return info
 
 
-def find_cardset_elements(handler: ActionHandler):
+def find_cardset_elements_parallel(handler: ActionHandler, hrefs, timeout=30):
+    """
+    Open several course pages in their own tabs at once and read their cardset tiles
+
+    The navigation is started in every tab without waiting for it, afterwards each tab is read as soon as
+    it rendered. All tabs share one ChromeDriver session, which may wait for a pending navigation before
+    it runs the next command, so whether the pages really load concurrently is not guaranteed - compare
+    'python debug/bench_replay.py --load-delay 1 --tabs 4' with '--tabs 1' before raising 'tabs'.
+
+    Returns:
+        List of (tile texts, learn-button hrefs) in the order of 'hrefs'
+    """
+    driver = handler.driver
+    main_window = driver.current_window_handle
+    windows = []
+    started = []  # when each tab's navigation began, the render latency counts from there
 
-    for _ in range(60):  # Reasonable number of attempts
+    try:
+        for href in hrefs:
+            driver.switch_to.new_window('tab')
+            started.append(time.perf_counter())
+            driver.execute_script("window.location.href = arguments[0];", href)  # returns without waiting for the load
+            windows.append(driver.current_window_handle)
 
-        if _ == 30: # Refresh each 30 tries
-            handler.driver.refresh()
+        results = []
+        for window, navigated in zip(windows, started):
+            driver.switch_to.window(window)
+            results.append(find_cardset_elements(handler, timeout, started=navigated))
 
+        return results
+
+    finally:
+        for window in windows:
+            try:
+                driver.switch_to.window(window)
+                driver.close()
+            except Exception:
+                pass
+        driver.switch_to.window(main_window)
+
+
+def find_cardset_elements(handler: ActionHandler, timeout=30, started=None):
+    """
+    Wait until the current course page shows its cardsets (or that it has none) and read them
+
+    Every probe waits in the browser (MutationObserver) for at most the pause the handler's WaitScheduler
+    allows, the page is refreshed only if it takes longer than course pages usually take (counted from
+    'started', the perf_counter time the navigation began, if given).
+
+    Returns:
+        Tuple (tile texts, learn-button hrefs)
+    """
+
+    def probe(budget):
         try:
-            # First check if resource tiles are available
-            if handler.element_exists("class", "rlg-col", timeout=0.5, output=False):
-                elements = handler.get_all_by("class", "rlg-col", timeout=0.5)
-                buttons = handler.get_all_by("class", "learn-btn", timeout=0.5)
-                return elements, buttons
-
-            # Check if empty state is shown
-            if handler.element_exists("class", "empty-state-wrapper", timeout=0.5, output=False):
-                return [], []
-            
-            # Brief pause before checking again
-            handler.wait_for(0.5)
-        except:
-            pass
-    
-    print("⚠️ Unexpected behavior in Cardset Extraction! (timeout reached)")
-
-    return [], []
+            result = handler.execute_async_script(COURSE_READY_SCRIPT, int(budget * 1000), timeout=budget)
+        except Exception as e:
+            logger.warning("⚠️ Error while reading the cardsets: %s", e)
+            time.sleep(budget)
+            return None
+
+        return (result["tiles"], result["hrefs"]) if result else None
+
+    result = handler.wait_for_screen("course", probe, timeout=timeout, started=started)
+
+    if result is None:
+        logger.warning("⚠️ Unexpected behavior in Cardset Extraction! (timeout reached)")
+        return [], []
+
+    return result
@@ -0,0 +1,108 @@
+import queue
+import threading
+
+from utils_generic import ActionHandler, setup_driver, DRIVER_PROFILES
+from procedures.process_cardset import extract_cardset
+from procedures.scrape_index import ScrapeIndex
+from procedures.media_download import ImageDownloader
+from procedures.login import read_session, apply_session
+from utils_logging import get_logger
+
+logger = get_logger("parallel")
+
+def extract_cardsets_parallel(handler: ActionHandler, all_cardsets, url, workers=2, headless=True, index: ScrapeIndex = None, compact=True, profile=None, first_card_check=False):
+    """
+    Process cardsets with a pool of browsers, each pulling the next cardset from a shared queue
+
+    The already logged in browser of 'handler' is worker #1, every additional worker gets its own
+    Chrome instance which is logged in by copying the cookies of the first session.
+
+    Args:
+        handler: ActionHandler of the already logged in browser
+        all_cardsets: Cardsets as returned by get_all_cardsets
+        url: Base URL the additional browsers are opened with (e.g. a local fixture server)
+        workers: Total number of browsers working on the queue (default: 2)
+        headless: Whether the additional browsers run headless (default: True), also with a profile
+        index: Optional ScrapeIndex shared by all workers
+        compact: Write the pretty printed JSON array per cardset instead of JSON lines (default: True)
+        profile: Optional driver profile of the additional browsers (see DRIVER_PROFILES), e.g. the one of the main browser - only its 'headless' is replaced
+        first_card_check: Skip complete cardsets whose first card is known, see extract_cardset (default: False)
+
+    Returns:
+        List of paths of the written JSON files
+    """
+
+    logger.info("\nStarting to process cardsets with %d workers...", workers)
+
+    cardset_queue = queue.Queue()
+    for cardset in all_cardsets:
+        cardset_queue.put(cardset)
+
+    output_paths = []
+    lock = threading.Lock()
+
+    downloader = ImageDownloader(handler.driver)  # all browsers share the session, so they share the downloads
+
+    # Even with the 'interactive' profile of the main browser the additional ones do not open windows
+    if isinstance(profile, str):
+        profile = DRIVER_PROFILES[profile]
+    worker_profile = dict(profile, headless=headless) if profile else None
+
+    def work(worker_handler: ActionHandler, number: int):
+        while True:
+            try:
+                cardset = cardset_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                output_path = extract_cardset(worker_handler, cardset, index, downloader, compact, first_card_check=first_card_check)
+                with lock:
+                    output_paths.append(output_path)
+            except Exception:
+                logger.exception("❌ Worker %d failed on cardset '%s'", number, cardset['cardset-text'])
+            finally:
+                cardset_queue.task_done()
+
+    def spawn(number: int):
+        driver = None
+        try:
+            driver = setup_driver(url, headless=headless, profile=worker_profile, instance=number)
+            share_session(handler.driver, driver)
+            work(ActionHandler(driver, wait_time=handler.wait_time, profiler=handler.profiler, waits=handler.waits), number)
+        except Exception:
+            logger.exception("❌ Worker %d could not be started", number)
+        finally:
+            if driver:
+                driver.quit()
+
+    # Do not start more browsers than there are cardsets
+    extra_workers = max(0, min(workers, len(all_cardsets)) - 1)
+
+    threads = [threading.Thread(target=spawn, args=(i + 2,), daemon=True) for i in range(extra_workers)]
+    for thread in threads:
+        thread.start()
+
+    work(handler, 1)  # The main browser works on the queue as well
+
+    for thread in threads:
+        thread.join()
+
+    downloader.close()
+
+    return output_paths
+
+# - - - UTILITY - - -
+
+def share_session(source_driver, target_driver):
+    """
+    Copy the cookies and local storage of a logged in browser into another browser on the same domain
+
+    Args:
+        source_driver: Logged in webdriver
+        target_driver: Webdriver which already opened a page of the same domain (see setup_driver)
+    """
+
+    apply_session(target_driver, read_session(source_driver))
+
+    target_driver.refresh()
@@ -1,138 +1,382 @@
 from datetime import datetime
-import requests
-import hashlib
-import json
+import logging
 import time
+import json
 import os
 
 from utils_generic import ActionHandler
+from procedures.scrape_index import ScrapeIndex
+from procedures.card_store import CardStore
+from procedures.media_download import ImageDownloader
+from procedures.media_store import MediaStore
+from procedures.image_refs import find_image_refs, unique_urls, rewrite_image_refs
+from procedures.card_fingerprint import card_fingerprint
+from procedures.result_writer import CardsetWriter
+from procedures.cardset_registry import CardsetRegistry, link_export
+from procedures.card_model import read_results
+from utils_logging import get_logger, Progress
+
+logger = get_logger("cardset")
+
+SCREEN_SELECTOR = ".goethe-container, .empty-state-wrapper, .diagram-box"  # everything that tells the screens apart
+MC_OPTION_SELECTOR = ".mcoptions-select-item"  # marked as 'correct' once a multiple-choice question is revealed
+RECOVERY_PASSES = 2  # retry budget per cardset for cards missed in the first pass
+OUTPUT_DIR = "results/data"  # default directory of the cardset files
+
+def extract_cardsets(handler, all_cardsets, index: ScrapeIndex = None, compact=True, output_dir=OUTPUT_DIR, store: MediaStore = None, registry: CardsetRegistry = None, first_card_check=False):
+    """
+    Extract the cardsets one after another with one browser
 
-def extract_cardsets(handler, all_cardsets):
+    Args:
+        output_dir: Directory the cardset files are saved to (default: 'results/data')
+        store: Optional MediaStore shared with other browsers / accounts (default: a store in 'results/media')
+        registry: Optional CardsetRegistry shared with other accounts, see extract_cardset
+        first_card_check: Skip complete cardsets whose first card is known, see extract_cardset (default: False)
 
-    print("\nStarting to process cardsets...")
+    Returns:
+        Number of cards scraped in this run (skipped, resumed and linked cards do not count)
+    """
+
+    logger.info("\nStarting to process cardsets...")
+
+    downloader = ImageDownloader(handler.driver, store)
+    counts = {"cards": 0}
 
     for cardset in all_cardsets:
+        extract_cardset(handler, cardset, index, downloader, compact, output_dir=output_dir, registry=registry, counts=counts, first_card_check=first_card_check)
+
+    downloader.close()
+
+    return counts["cards"]
+
+
+def extract_cardset(handler: ActionHandler, cardset, index: ScrapeIndex = None, downloader: ImageDownloader = None, compact=True, recovery_passes=RECOVERY_PASSES, output_dir=OUTPUT_DIR, registry: CardsetRegistry = None, counts: dict = None, first_card_check=False):
+    """
+    Walk through a single cardset until all of its cards are collected and save them to 'output_dir'
+
+    Accepted cards are streamed to a JSON lines file right away, so memory does not grow with the cardset.
+
+    Args:
+        handler: ActionHandler of an already logged in browser
+        cardset: Cardset dictionary as returned by get_all_cardsets
+        index: Optional ScrapeIndex to skip unchanged cardsets and resume interrupted ones
+        downloader: Optional ImageDownloader shared between cardsets and workers (only the images of this cardset are waited for), otherwise one is created for this cardset
+        compact: Turn the JSON lines into the pretty printed JSON array once the cardset is done (default: True)
+        recovery_passes: Passes after the first one to recover missed cards, each only walks up to the last missing card (default: 2)
+        output_dir: Directory the cardset file is saved to (default: 'results/data')
+        registry: Optional CardsetRegistry shared with other accounts, complete exports are registered for them.
+                  Nothing is linked from it: the UI only knows all cards of the cardset after walking it
+        counts: Optional dictionary, its 'cards' are increased by the cards scraped in this run (for throughput reports)
+        first_card_check: Skip a complete cardset of the index if the card shown on opening it is known (default: False).
+                          Only that card is compared, an edit of another card which kept the count is missed,
+                          so without it a complete cardset opened here is scraped again.
+
+    Returns:
+        Path of the written file (of the previous run if the cardset was skipped)
+    """
+
+    # The downloader may be shared with other workers, only the downloads of this cardset are waited for
+    downloader = (downloader or ImageDownloader(handler.driver)).batch(owned=downloader is None, driver=handler.driver)
 
-        count = 0
-        total_results = []
+    writer = CardsetWriter(output_base_path(cardset, output_dir))  # only creates a file once a card is written
+    total_results = CardStore(keep_results=False)
 
-        while count < cardset["cardset-count"]:
+    stored = index.begin_cardset(cardset) if index else None
 
-            results = []
+    # Positions (in the order of a full run) whose card was read cleanly, the rest are gaps to recover.
+    # A pass stops after the last gap, cards can only be reached by clicking through the ones before.
+    expected = cardset["cardset-count"]
+    recovered = set()
+    clean_sizes = set()  # number of cards of passes which got to the end screen without a skipped card
+    gaps = None  # None: not known before the first pass
+    checkpointed = {}  # position -> (type, hash) of the cards an interrupted run already saved, they are only clicked past
+    repeats = {}  # position -> hash of a card read again right after itself, a skip unless a later pass sees it there again
 
-            print(f"\nProcessing cardset: {cardset['cardset-text']}")
+    # Resume from the last checkpoint (a completed cardset is either skipped or scraped again below)
+    if index and not (stored and stored["complete"]):
+        resumed = index.load_cards(cardset)
+        if resumed:
+            logger.info("\nResuming cardset '%s' with %d checkpointed cards", cardset['cardset-text'], len(resumed))
+            checkpointed = {p: card for p, card in index.load_positions(cardset).items() if p < expected}
+            recovered = set(checkpointed)
+            gaps = set(range(expected)) - recovered
+        for result in resumed:
+            if total_results.add(result):
+                writer.write(result)
+        del resumed
 
-            handler.driver.get(cardset["cardset-href"])
+    progress = Progress(cardset["cardset-text"], cardset["cardset-count"])
+    passes = 0
+    scraped = 0  # new cards of all passes
 
-            results = []
+    while gaps is None or (gaps and passes <= recovery_passes):
 
-            error = True
+        fast_forward = bool(checkpointed)  # until a click past a checkpointed card does not change the screen
 
-            # - - - First get to the cardset Overview Page
+        passes += 1
+        stop_at = max(gaps) + 1 if gaps else None
 
-            first_rsp = find_goethe_elements(handler)
+        logger.info("\nProcessing cardset: %s%s", cardset['cardset-text'], f" (recovering {len(gaps)} missing cards)" if gaps else "")
 
-            if first_rsp["is_card"]:
-                error = leave_card_to_overview(handler)  # clicks the X and on the overview starts a full run through all cards
-            
-            if error:
-                print("⚠️ Unexpected behavior in Navigation to Overview!")
+        opened = time.perf_counter()
+        handler.driver.get(cardset["cardset-href"])
 
+        error = True
 
-            keep_scraping = True
+        # - - - First get to the cardset Overview Page
 
-            while keep_scraping:
+        first_rsp = find_goethe_elements(handler, downloader, screen="cardset", started=opened)
 
-                rsp = find_goethe_elements(handler)
+        # - - - Skip the cardset if its count and cards did not change since the last complete run
 
-                if rsp["is_card"]:
-                    # Download images for all card types
-                    if rsp["type"] == "card":
-                        # For regular cards, we need to download images here since extract_card doesn't have handler
-                        rsp["card"] = extract_and_download_pictures(handler, rsp["card"], log=True)
-                    # For multiple-choice cards, images are already downloaded in extract_multiple_choice
-                    
-                    results.append(rsp)
-                    click_to_next(handler, rsp["type"])
-                    time.sleep(0.25)
+        if passes == 1 and stored and stored["complete"]:
+            if first_card_check and first_rsp["is_card"] and first_rsp["card"]["hash"] in index.known_hashes(cardset) and stored["output_path"]:
+                logger.info("✓ Cardset '%s' is unchanged, keeping %s", cardset['cardset-text'], stored['output_path'])
+                downloader.close()
+                return stored["output_path"]
 
-                if rsp["type"] == "end":
-                    print("Reached the end of the cardset.")
-                    keep_scraping = False
+            logger.info("Cardset '%s' may have changed since the last run, scraping it again", cardset['cardset-text'])
+            index.reset_cardset(cardset)
+
+        if first_rsp["is_card"]:
+            error = leave_card_to_overview(handler, downloader)  # clicks the X and on the overview starts a full run through all cards
+        
+        if error:
+            logger.warning("⚠️ Unexpected behavior in Navigation to Overview!")
 
-                if rsp["type"] == "overview" or rsp["type"] == "error":
-                    print("⚠️ Unexpected behavior in Extraction, Overview was openend!")
 
-            # - - - Save the results for this cardset
+        position = 0
+        new_count = 0
+        previous_hash = None
+        reached_end = False
+        clean = True
+        clicked = None  # the card after the last click to the next one
 
-            all_hashs = [r["card"]["hash"] for r in total_results if "hash" in r["card"]]
-            new_count = 0
+        while stop_at is None or position < stop_at:
 
-            for result in results:
-                if result["card"]["hash"] not in all_hashs:
-                    total_results.append(result)
-                    all_hashs.append(result["card"]["hash"])
+            # A card saved by the interrupted run: click past it without reading it or its images
+            if fast_forward and position in checkpointed:
+                card_type, card_hash = checkpointed[position]
+                clicked = time.perf_counter()
+                if not click_past_card(handler, card_type):
+                    fast_forward = False  # the click did not register, read the cards from here on
+                    continue
+                previous_hash = card_hash
+                position += 1
+                continue
+
+            rsp = find_goethe_elements(handler, downloader, started=clicked)
+
+            if rsp["is_card"]:
+                # Download images for all card types
+                if rsp["type"] == "card":
+                    # For regular cards, we need to download images here since extract_card doesn't have handler
+                    rsp["card"] = extract_and_download_pictures(handler, rsp["card"], log=True, downloader=downloader)
+                # For multiple-choice cards, images are already downloaded in extract_multiple_choice
+
+                # The same card twice in a row: the screen did not change in time, so the card at this position was skipped.
+                # If another pass reads it at the same position again, the cardset really has it twice in a row
+                if rsp["card"]["hash"] != previous_hash or repeats.get(position) == rsp["card"]["hash"]:
+                    recovered.add(position)
+                else:
+                    repeats[position] = rsp["card"]["hash"]
+                    clean = False
+                previous_hash = rsp["card"]["hash"]
+
+                # - - - Save the card right away if it is new
+                if total_results.add(rsp):
+                    writer.write(rsp)
                     new_count += 1
 
-            print(f"Extracted new {new_count} cards from the cardset '{cardset['cardset-text']}'.")
-            print(f"Total cards extracted so far: {len(total_results)}")
-            print(f"Expected cards in this cardset: {cardset['cardset-count']}")
+                    if index:
+                        index.checkpoint_card(cardset, rsp, position)
+
+                    progress.update(len(total_results))
+
+                position += 1
+
+                signature = handler.content_signature(SCREEN_SELECTOR)
+                clicked = time.perf_counter()
+                click_to_next(handler, rsp["type"])
+                handler.wait_for_change(SCREEN_SELECTOR, signature)  # continue as soon as the next card rendered
+
+            elif rsp["type"] == "end":
+                logger.info("Reached the end of the cardset.")
+                reached_end = True
+                break
+
+            else:
+                logger.warning("⚠️ Unexpected behavior in Extraction, Overview was openend! Stopping the pass at card %d", position)
+                break
+
+        # A clean pass to the end screen tells the real size of the cardset, as the count badge can be wrong.
+        # More cards are taken right away, fewer only once a second pass confirms it (a card can be skipped unnoticed)
+        if reached_end and clean and position != expected:
+            if position > expected or position in clean_sizes:
+                logger.warning("⚠️ The cardset '%s' has %d cards, its count says %d", cardset['cardset-text'], position, expected)
+                expected = position
+            clean_sizes.add(position)
+
+        gaps = set(range(expected)) - recovered
+
+        scraped += new_count
+        logger.info("Extracted new %d cards from the cardset '%s'.", new_count, cardset['cardset-text'])
+        logger.info("Total cards extracted so far: %d", len(total_results))
+        logger.info("Expected cards in this cardset: %d", expected)
 
-            count = len(total_results)  # Update count to the number of cards extracted
+    if gaps:
+        logger.warning(
+            "⚠️ %d cards of '%s' could not be recovered after %d passes (positions %s)",
+            len(gaps), cardset['cardset-text'], passes, ", ".join(str(g + 1) for g in sorted(gaps)),
+            extra={"cardset": cardset["cardset-href"], "missing_positions": sorted(gaps), "expected": expected, "found": len(total_results)}
+        )
 
-        # Create timestamp
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
+    progress.finish()
 
-        # Create filename using cardset details for uniqueness
-        filename = f"{timestamp}_{cardset['cardset-text']}_{cardset['cardset-href'].split('/')[-1]}.json"
-        filename = ''.join(c if c.isalnum() or c in ['_', '-', '.'] else '_' for c in filename)
+    # More cards than expected means duplicates with a different hash. The fingerprint makes equal cards hash
+    # equally, but a card read while it was still rendering has empty fields and so another hash - keep the best one per question
+    keep = total_results.best_hashes() if len(total_results) > cardset['cardset-count'] else None
 
-        # Ensure the output directory exists
-        output_dir = 'results/data'
-        os.makedirs(output_dir, exist_ok=True)
+    # The images were downloaded in the background, wait for them and point the cards to the stored files
+    failed = downloader.wait()
+    if failed:
+        logger.warning("⚠️ %d images could not be downloaded, keeping their original URLs", len(failed))
 
-        if len(total_results) > cardset['cardset-count']:
-            total_results = total_results_duplicate_check(total_results)
+    downloader.close()
 
-        # Save results to JSON file
-        output_path = os.path.join(output_dir, filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(total_results, f, ensure_ascii=False, indent=2)
+    # Save results to the final file, card by card
+    output_path = writer.finish(compact=compact, keep=keep, transform=lambda result: resolve_pictures(result, downloader.store))
 
-        print(f"Saved results to {output_path}")
+    logger.info("Saved results to %s", output_path)
+
+    if index and not gaps:  # with unrecovered cards the next run tries again
+        index.complete_cardset(cardset, output_path)
+
+    if registry and not gaps:
+        registry.register(cardset, output_path, keep if keep is not None else total_results.hashes(), source=output_dir)
+
+    if counts is not None:
+        counts["cards"] = counts.get("cards", 0) + scraped
+
+    return output_path
 
 # - - - UTILITY - - -
 
-def find_goethe_elements(handler: ActionHandler):
+def output_base_path(cardset, output_dir=OUTPUT_DIR):
+    """ Timestamped path (without extension) in 'output_dir' the cardset is saved to """
 
-    type = None  # card, multiple-choice, overview, end
+    # Create timestamp
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
 
-    for _ in range(30):
+    # Create filename using cardset details for uniqueness
+    filename = f"{timestamp}_{cardset['cardset-text']}_{cardset['cardset-href'].split('/')[-1]}"
+    filename = ''.join(c if c.isalnum() or c in ['_', '-', '.'] else '_' for c in filename)
+
+    return os.path.join(output_dir, filename)
+
+
+def adopt_shared_export(cardset, shared, index: ScrapeIndex, output_dir=OUTPUT_DIR):
+    """
+    Link an export found in the CardsetRegistry into 'output_dir' and checkpoint its cards, so the
+    ScrapeIndex skips the cardset on later runs of this account as if it had walked it itself
+
+    Returns:
+        Path of the linked file
+    """
+    output_path = link_export(shared["output_path"], output_base_path(cardset, output_dir))
+
+    if index:
+        index.reset_cardset(cardset)
+        for position, result in enumerate(read_results(output_path)):
+            index.checkpoint_card(cardset, result, position)
+        index.complete_cardset(cardset, output_path)
+
+    return output_path
+
+
+SCREEN_SNAPSHOT_SCRIPT = """
+    const read = (e) => ({
+        text: e.innerText || '',
+        html: e.innerHTML || '',
+        class: e.getAttribute('class') || ''
+    });
+
+    const containers = document.getElementsByClassName('goethe-container');
+    if (containers.length > 0) {
+        return {
+            screen: 'card',
+            containers: Array.from(containers, read),
+            options: Array.from(document.getElementsByClassName('mcoptions-select-item'), read)
+        };
+    }
+
+    if (document.getElementsByClassName('empty-state-wrapper').length > 0) {
+        return {screen: 'end'};
+    }
+
+    if (document.getElementsByClassName('diagram-box').length > 0) {
+        return {screen: 'overview'};
+    }
+
+    return {screen: null};
+"""
+
+
+def snapshot_screen(handler: ActionHandler):
+    """
+    Classify the current screen and read all card data with a single WebDriver round trip
+
+    Returns:
+        Dictionary with 'screen' ('card', 'end', 'overview' or None while nothing is rendered yet),
+        for cards additionally 'containers' and 'options' as lists of {'text', 'html', 'class'}
+    """
+    try:
+        return handler.driver.execute_script(SCREEN_SNAPSHOT_SCRIPT) or {"screen": None}
+    except Exception as e:
+        logger.warning("⚠️ Error taking screen snapshot: %s", e)
+        return {"screen": None}
+
+
+def find_goethe_elements(handler: ActionHandler, downloader: ImageDownloader = None, screen="card", timeout=15, started=None):
+    """
+    Wait for the next screen of a cardset (card, end or overview) and read it
+
+    The waiting follows the handler's WaitScheduler: the page is refreshed only if it takes longer than
+    screens of the same type usually take (instead of after a fixed number of tries).
+
+    Args:
+        screen: Screen type the render latency is learned for, 'cardset' right after opening a cardset (default: 'card')
+        timeout: Seconds until giving up (default: 15 seconds)
+        started: time.perf_counter() of the click or navigation leading to the screen, the render latency counts from there
+
+    Returns:
+        {'is_card', 'type', 'card'}, type 'error' if no screen was recognized within the timeout
+    """
+
+    def probe(budget):
+        snapshot = snapshot_screen(handler)
 
-        if _ == 15: # Refresh each 15 tries
-            handler.driver.refresh()
-        
         # goethe-container - card (normal or multiple-choice)
-        if handler.element_exists("class", "goethe-container", timeout=0.5, output = False):
-            elements = handler.get_all_by("class", "goethe-container", timeout=0.5, output = False)
-            
-            if len(elements) == 1 and handler.element_exists("class", "mcoptions-select-item", timeout=0.5, output = False):
+        if snapshot["screen"] == "card":
+            containers = snapshot["containers"]
+
+            if len(containers) == 1 and snapshot["options"]:
                 return {
                     "is_card": True,
                     "type": "multiple-choice",
-                    "card": extract_multiple_choice(handler, elements)
+                    "card": extract_multiple_choice(handler, containers, downloader)
                 }
-            elif len(elements) == 2:
+            elif len(containers) == 2:
                 return {
                     "is_card": True,
                     "type": "card",
-                    "card": extract_card(elements)
+                    "card": extract_card(containers)
                 }
             else:
-                print("⚠️ Unexpected behavior in Card Extraction!")
+                logger.warning("⚠️ Unexpected behavior in Card Extraction!")
 
         # check for "end" screen
-        elif handler.element_exists("class", "empty-state-wrapper", timeout=0.5, output = False):
+        elif snapshot["screen"] == "end":
             return {
                 "is_card": False,
                 "type": "end",
@@ -140,49 +384,48 @@ def find_goethe_elements(handler: ActionHandler):
             }
         
         # check for "overview" screen
-        elif handler.element_exists("class", "diagram-box", timeout=0.5, output = False):
+        elif snapshot["screen"] == "overview":
             return {
                 "is_card": False,
                 "type": "overview",
                 "card": None
             }
 
-    print("⚠️ Unexpected behavior in Card Extraction! (timeout reached)") 
+        if budget > 0:
+            if snapshot["screen"] is None:
+                handler.wait_for_change(SCREEN_SELECTOR, "", timeout=budget)  # Nothing rendered yet, wait until something shows up
+            else:
+                time.sleep(budget)  # A card is still rendering, the observer would return right away
 
-    return {
-        "is_card": False,
-        "type": "error",
-        "card": None
-    }
+        return None
 
+    rsp = handler.wait_for_screen(screen, probe, timeout=timeout, started=started)
+
+    if rsp is None:
+        logger.warning("⚠️ Unexpected behavior in Card Extraction! (timeout reached)")
+
+        return {
+            "is_card": False,
+            "type": "error",
+            "card": None
+        }
+
+    return rsp
 
-def extract_card(elements):
-    """ len(elements) == 2 """
+
+def extract_card(containers):
+    """ len(containers) == 2, as read by snapshot_screen """
     
     picture_hrefs = []
 
-    # Extract data from elements with error handling
-    try:
-        question_text = elements[0].text.strip()
-        question_html = elements[0].get_attribute("innerHTML").strip()
-        answer_text = elements[1].text.strip()
-        answer_html = elements[1].get_attribute("innerHTML").strip()
-    except Exception as e:
-        print(f"⚠️ Error extracting card data: {e}")
-        # Set empty values if extraction fails
-        question_text = ""
-        question_html = ""
-        answer_text = ""
-        answer_html = ""
-
     rsp = {
         "question": {
-            "text": question_text,
-            "html": question_html
+            "text": containers[0]["text"].strip(),
+            "html": containers[0]["html"].strip()
         },
         "answer": {
-            "text": answer_text,
-            "html": answer_html
+            "text": containers[1]["text"].strip(),
+            "html": containers[1]["html"].strip()
         },
         "pictures": picture_hrefs
     }
@@ -190,57 +433,81 @@ def extract_card(elements):
     # Note: Image downloading is handled separately for regular cards
     # since we don't have the handler here
     
-    # Create a unique hash from the card content
-    content_to_hash = json.dumps(rsp, sort_keys=True).encode('utf-8')
-    rsp["hash"] = hashlib.md5(content_to_hash).hexdigest()
+    # Create a unique hash from the card content (before the image rewrite, as for multiple-choice cards)
+    rsp["hash"] = card_fingerprint("card", rsp)
     
     return rsp
 
 
-def extract_multiple_choice(handler: ActionHandler, elements):
-    """ len(elements) == 1"""
+# Reads the question, clicks "flip" and resolves with the options once they are marked as correct (or after the timeout)
+MC_REVEAL_SCRIPT = """
+    const [timeout, done] = arguments;
+
+    const read = (e) => ({
+        text: e.innerText || '',
+        html: e.innerHTML || '',
+        class: e.getAttribute('class') || ''
+    });
+    const options = () => Array.from(document.getElementsByClassName('mcoptions-select-item'), read);
+    const revealed = () => options().some(o => o.class.includes('correct'));
+
+    const container = document.getElementsByClassName('goethe-container')[0];
+    const question = container ? read(container) : null;  // read BEFORE clicking anything
 
-    element = elements[0]  # Assuming the first element is the one we need
+    const flip = document.getElementsByClassName('flip')[0];
+    if (!flip) { done({question, options: options(), flipped: false, revealed: false}); return; }
+
+    let finished = false;
+    const finish = () => {
+        if (finished) return;
+        finished = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        done({question, options: options(), flipped: true, revealed: revealed()});
+    };
+
+    const observer = new MutationObserver(() => { if (revealed()) finish(); });
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, attributeFilter: ['class']});
+    const timer = setTimeout(finish, timeout);
+
+    flip.click();
+    if (revealed()) finish();
+"""
+
+
+def extract_multiple_choice(handler: ActionHandler, containers, downloader: ImageDownloader = None, timeout=2):
+    """
+    len(containers) == 1, as read by snapshot_screen
+
+    Revealing the answer and reading question and options is a single script call (MC_REVEAL_SCRIPT).
+    """
 
-    # Extract question data BEFORE clicking anything to avoid stale element reference
     try:
-        question_text = element.text.strip()
-        question_html = element.get_attribute("innerHTML").strip()
+        revealed = handler.execute_async_script(MC_REVEAL_SCRIPT, int(timeout * 1000), timeout=timeout)
     except Exception as e:
-        print(f"⚠️ Error extracting question data: {e}")
-        # Try to re-find the element
-        try:
-            elements = handler.get_all_by("class", "goethe-container", timeout=0.5, output=False)
-            if elements:
-                element = elements[0]
-                question_text = element.text.strip()
-                question_html = element.get_attribute("innerHTML").strip()
-            else:
-                question_text = ""
-                question_html = ""
-        except:
-            question_text = ""
-            question_html = ""
+        logger.warning("⚠️ Error while revealing the multiple-choice answer: %s", e)
+        revealed = {"question": None, "options": [], "flipped": False, "revealed": False}
 
-    # Immediately click the "reveal" button to show the answer
-    handler.action_by("class", "flip", "click", timeout=0.5)
+    if not revealed["flipped"]:
+        logger.warning("⚠️ The 'flip' button of the multiple-choice question was not found!")
+    elif not revealed["revealed"]:
+        logger.warning("⚠️ No option was marked as correct within %ss", timeout)
 
-    answer_elements = handler.get_all_by("class", "mcoptions-select-item", timeout=0.5, output = False)
+    question = revealed["question"] or containers[0]
+    question_text = question["text"].strip()
+    question_html = question["html"].strip()
+
+    answer_options = revealed["options"]
 
     picture_hrefs = []
 
     answers = []
-    for ans in answer_elements:
-        try:
-            answers.append({
-                "text": ans.text.strip(),
-                "html": ans.get_attribute("innerHTML").strip(),
-                "is_correct": "correct" in ans.get_attribute("class")  # get all classes and check if it contains "correct"
-            })
-        except Exception as e:
-            print(f"⚠️ Error extracting answer data: {e}")
-            # Skip this answer if we can't extract it
-            continue
+    for ans in answer_options:
+        answers.append({
+            "text": ans["text"].strip(),
+            "html": ans["html"].strip(),
+            "is_correct": "correct" in ans["class"]  # get all classes and check if it contains "correct"
+        })
 
     rsp = {
         "question": {
@@ -251,32 +518,38 @@ def extract_multiple_choice(handler: ActionHandler, elements):
         "pictures": picture_hrefs
     }
 
-    rsp = extract_and_download_pictures(handler, rsp, log=True)
+    # Create a unique hash from the card content (before the image rewrite, as for regular cards)
+    rsp["hash"] = card_fingerprint("multiple-choice", rsp)
 
-    # Create a unique hash from the card content
-    content_to_hash = json.dumps(rsp, sort_keys=True).encode('utf-8')
-    rsp["hash"] = hashlib.md5(content_to_hash).hexdigest()
+    rsp = extract_and_download_pictures(handler, rsp, log=True, downloader=downloader)
     
     return rsp
     
 
-def leave_card_to_overview(handler: ActionHandler):
+def leave_card_to_overview(handler: ActionHandler, downloader: ImageDownloader = None):
+
+    signature = handler.content_signature(SCREEN_SELECTOR)
 
+    clicked = time.perf_counter()
     error = click_icon(handler, 4)  # Click the "X" buttonn (4th icon button)
 
     if error:
-        print("⚠️ Error while clicking the 'X' button to leave the card!")
+        logger.warning("⚠️ Error while clicking the 'X' button to leave the card!")
         return True
 
-    rsp = find_goethe_elements(handler)
+    handler.wait_for_change(SCREEN_SELECTOR, signature)
+
+    rsp = find_goethe_elements(handler, downloader, screen="overview", started=clicked)
 
     if rsp["type"] == "overview":
         
-        handler.action_by("class", "all-courses-col", "click", timeout=0.5)  # Click the overview box to start the full run
+        signature = handler.content_signature(SCREEN_SELECTOR)
+        handler.action_by("class", "all-courses-col", "click", timeout=0.5, wait_overwrite=0)  # Click the overview box to start the full run
+        handler.wait_for_change(SCREEN_SELECTOR, signature)
 
         return False
 
-    print("⚠️ Unexpected behavior in Navigation to Overview!")
+    logger.warning("⚠️ Unexpected behavior in Navigation to Overview!")
     return True  # TOOD: Maybe throw an exception here to stop the process?
         
 
@@ -284,11 +557,11 @@ def click_icon(handler: ActionHandler, occurence: int):
     button_elements = handler.get_all_by("class", "btn-icon-only", timeout=0.5, output = False)
 
     if len(button_elements) < occurence:
-        print(f"⚠️ Not enough buttons found! Expected at least {occurence}, found {len(button_elements)}.")
+        logger.warning("⚠️ Not enough buttons found! Expected at least %d, found %d.", occurence, len(button_elements))
         return True
     
     elif len(button_elements) != 6:
-        print(f"⚠️ Unexpected number of buttons found! Expected 6, found {len(button_elements)}.")
+        logger.warning("⚠️ Unexpected number of buttons found! Expected 6, found %d.", len(button_elements))
         return True
 
     button_elements[occurence - 1].click()  # Click the button at the specified occurrence
@@ -301,295 +574,119 @@ def click_to_next(handler: ActionHandler, type: str):
     Clicks the "next" button to go to the next card or multiple-choice question.
     """
     if type == "multiple-choice":
-        handler.action_by("class", "flip", "click", timeout=0.5)  # Click the "flip" button for a multiple-choice question
+        handler.action_by("class", "flip", "click", timeout=0.5, wait_overwrite=0)  # Click the "flip" button for a multiple-choice question, the caller waits for the next card
         
     elif type == "card":
         click_icon(handler, 5)  # Click the "next / wrong" button for a normal card
     
     else:
-        print(f"⚠️ Unexpected type '{type}' in click_to_next!")
+        logger.warning("⚠️ Unexpected type '%s' in click_to_next!", type)
+
+
+
+def click_past_card(handler: ActionHandler, type: str):
+    """
+    Go to the next card without reading the current one (a multiple-choice question is revealed first, as when it is read)
+
+    Returns:
+        Whether the next screen rendered
+    """
+    if type == "multiple-choice":
+        signature = handler.content_signature(MC_OPTION_SELECTOR)
+        handler.action_by("class", "flip", "click", timeout=0.5, wait_overwrite=0)
+        handler.wait_for_change(MC_OPTION_SELECTOR, signature, timeout=2)  # a question without a correct option does not change
+
+    signature = handler.content_signature(SCREEN_SELECTOR)
+    click_to_next(handler, type)
+    return handler.wait_for_change(SCREEN_SELECTOR, signature) is not None
 
     
-def extract_and_download_pictures(handler: ActionHandler, rsp, log: bool = False) -> dict:
+def extract_and_download_pictures(handler: ActionHandler, rsp, log: bool = False, downloader: ImageDownloader = None) -> dict:
     """
     Extract and download pictures from card content, replacing URLs with local paths.
     
     Args:
         handler: ActionHandler instance for downloading images (uses driver's cookies)
         rsp: Card response dictionary containing HTML content
-        log: Whether to print debug information (default: False)
+        log: Whether to log the single steps, at DEBUG level (default: False)
+        downloader: ImageDownloader the downloads are queued on, without one they are downloaded right away
         
     Returns:
-        Updated dictionary with local image paths
+        Updated dictionary with local image paths for all already stored images,
+        URLs which are still downloading are replaced later by resolve_pictures
     """
-    import re
-    import os
-    import base64
-    from urllib.parse import urlparse
-    
-    # Convert response to string for searching
-    rsp_str = json.dumps(rsp, ensure_ascii=False)
     
+    log = log and logger.isEnabledFor(logging.DEBUG)  # the steps (and the card dump) are only built if they are shown
+
     if log:
-        print(f"Debug: Searching for images in JSON string (first 500 chars): {rsp_str[:500]}")
-    
-    # Multiple patterns to catch different image URL formats
-    patterns = [
-        # Pattern for escaped quotes in JSON
-        r'src=\\"(https://[^"]*\\.(?:png|jpg|jpeg|gif|webp|svg)[^"]*)\\"',
-        # Pattern for regular quotes
-        r'src="(https://[^"]*\.(?:png|jpg|jpeg|gif|webp|svg)[^"]*)"',
-        # Pattern for single quotes
-        r"src='(https://[^']*\.(?:png|jpg|jpeg|gif|webp|svg)[^']*)'",
-        # Pattern without quotes (less likely but possible)
-        r'src=(https://[^\s>]*\.(?:png|jpg|jpeg|gif|webp|svg)[^\s>]*)',
-        # More general pattern for any image URL
-        r'(https://[^\s"\'<>]*\.(?:png|jpg|jpeg|gif|webp|svg)(?:\?[^\s"\'<>]*)?)',
-    ]
+        logger.debug("Debug: Searching for images in card (first 500 chars): %s", json.dumps(rsp, ensure_ascii=False)[:500])
     
-    all_matches = []
-    for pattern in patterns:
-        matches = re.findall(pattern, rsp_str, re.IGNORECASE)
-        if matches:
-            if log:
-                print(f"Found {len(matches)} matches with pattern: {pattern}")
-            # Some patterns return tuples, others return strings
-            for match in matches:
-                if isinstance(match, tuple):
-                    # Take the first group (the URL)
-                    url = match[0] if match[0] else (match[1] if len(match) > 1 else match)
-                else:
-                    url = match
-                if url and url not in all_matches:
-                    all_matches.append(url)
+    # Walk the html fields once, the positions are kept for the rewrite
+    refs = find_image_refs(rsp)
+    image_urls = unique_urls(refs)
     
-    if not all_matches:
+    if not image_urls:
         if log:
-            print("No images found in card content")
+            logger.debug("No images found in card content")
         return rsp
     
-    # Use all found URLs
-    image_urls = all_matches
-    
     if log:
-        print(f"Found {len(image_urls)} images to download")
-    
-    # Ensure media directory exists
-    media_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'results', 'media')
-    os.makedirs(media_dir, exist_ok=True)
+        logger.debug("Found %d images to download", len(image_urls))
+
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = ImageDownloader(handler.driver, log=log)
     
-    # Process each image URL
+    # Process each image URL, known URLs need neither a request nor hashing
     url_mapping = {}
     
     for image_url in image_urls:
-        try:
-            # Extract filename from URL
-            parsed_url = urlparse(image_url)
-            filename = os.path.basename(parsed_url.path)
-            
-            # If no filename, create one from URL hash
-            if not filename or '.' not in filename:
-                url_hash = hashlib.md5(image_url.encode()).hexdigest()[:8]
-                filename = f"{url_hash}.png"
-            
-            # Ensure we have an extension
-            if '.' not in filename:
-                filename += '.png'
-            
-            local_path = os.path.join(media_dir, filename)
-            
-            # Download image if not already exists
-            if not os.path.exists(local_path):
-                if log:
-                    print(f"Downloading: {image_url}")
-                
-                try:
-                    # Method 1: Use handler's driver to download with cookies in a new tab
-                    # Store current window handle
-                    current_window = handler.driver.current_window_handle
-                    
-                    # Open image in new tab
-                    handler.driver.execute_script(f"window.open('{image_url}', '_blank');")
-                    
-                    # Switch to the new tab
-                    new_window = None
-                    for window_handle in handler.driver.window_handles:
-                        if window_handle != current_window:
-                            new_window = window_handle
-                            break
-                    
-                    if new_window:
-                        handler.driver.switch_to.window(new_window)
-                        time.sleep(1)  # Wait for image to load
-                        
-                        # Get image data as base64
-                        image_data = handler.driver.execute_script("""
-                            var canvas = document.createElement('canvas');
-                            var ctx = canvas.getContext('2d');
-                            var img = document.getElementsByTagName('img')[0];
-                            if (img && img.complete && img.naturalWidth > 0) {
-                                canvas.width = img.naturalWidth;
-                                canvas.height = img.naturalHeight;
-                                ctx.drawImage(img, 0, 0);
-                                return canvas.toDataURL().split(',')[1];
-                            }
-                            return null;
-                        """)
-                        
-                        # Close the new tab and switch back to original
-                        handler.driver.close()
-                        handler.driver.switch_to.window(current_window)
-                    else:
-                        if log:
-                            print(f"⚠️ Could not open new tab for: {image_url}")
-                        image_data = None
-                    
-                    if image_data:
-                        # Decode base64 and save
-                        with open(local_path, 'wb') as f:
-                            f.write(base64.b64decode(image_data))
-                        
-                        if log:
-                            print(f"✓ Saved: {filename}")
-                    else:
-                        # Method 2: Try direct request with session cookies
-                        if log:
-                            print(f"⚠️ Canvas method failed, trying direct request for: {image_url}")
-                        
-                        # Get cookies from selenium driver
-                        cookies = handler.driver.get_cookies()
-                        session = requests.Session()
-                        for cookie in cookies:
-                            session.cookies.set(cookie['name'], cookie['value'])
-                        
-                        # Add headers to mimic browser
-                        headers = {
-                            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                            'Accept-Language': 'en-US,en;q=0.9',
-                            'Accept-Encoding': 'gzip, deflate, br',
-                            'Connection': 'keep-alive',
-                            'Upgrade-Insecure-Requests': '1',
-                        }
-                        
-                        response = session.get(image_url, headers=headers, timeout=10)
-                        if response.status_code == 200 and len(response.content) > 0:
-                            with open(local_path, 'wb') as f:
-                                f.write(response.content)
-                            if log:
-                                print(f"✓ Saved via direct request: {filename}")
-                        else:
-                            if log:
-                                print(f"⚠️ Direct request failed ({response.status_code}), keeping original URL: {image_url}")
-                            url_mapping[image_url] = image_url  # Keep original URL
-                            continue
-                            
-                except Exception as e:
-                    if log:
-                        print(f"⚠️ Both download methods failed for {image_url}: {e}")
-                    url_mapping[image_url] = image_url  # Keep original URL
-                    continue
-            else:
-                if log:
-                    print(f"✓ Already exists: {filename}")
-            
-            # Store mapping for URL replacement
-            relative_path = f"results/media/{filename}"
-            url_mapping[image_url] = relative_path
-            
-        except Exception as e:
+        local_path = downloader.store.lookup(image_url)
+
+        if local_path:
             if log:
-                print(f"❌ Failed to download {image_url}: {e}")
-            # Keep original URL if download fails
-            url_mapping[image_url] = image_url
-    
-    # Replace URLs in the response with local paths
-    updated_rsp_str = rsp_str
-    replacement_count = 0
-    for original_url, local_path in url_mapping.items():
-        if original_url in updated_rsp_str:
-            updated_rsp_str = updated_rsp_str.replace(original_url, local_path)
-            replacement_count += 1
+                logger.debug("✓ Already stored: %s -> %s", image_url, local_path)
+            url_mapping[image_url] = local_path
+        else:
             if log:
-                print(f"  ✓ Replaced {original_url} -> {local_path}")
-        elif log:
-            print(f"  ⚠️ URL not found in response: {original_url}")
+                logger.debug("Queueing download: %s", image_url)
+            downloader.submit(image_url)  # the scraper continues while it runs in the background
     
-    if log:
-        print(f"Made {replacement_count} URL replacements")
-    
-    # Convert back to dictionary
-    try:
-        updated_rsp = json.loads(updated_rsp_str)
+    if own_downloader:
+        downloader.wait(driver=handler.driver)
+        downloader.close()
+        for image_url in image_urls:
+            if image_url not in url_mapping and downloader.store.lookup(image_url):
+                url_mapping[image_url] = downloader.store.lookup(image_url)
+
+    if url_mapping:
+        replacement_count = rewrite_image_refs(rsp, refs, url_mapping)
+        if log:
+            logger.debug("Made %d URL replacements", replacement_count)
 
-        # Add picture paths to the 'pictures' field
-        picture_paths = [path for path in url_mapping.values() if path and path.startswith('results/media/')]
-        if picture_paths:
-            updated_rsp['pictures'] = picture_paths
+    return rsp
 
-        if log:
-            successful_downloads = len([v for v in url_mapping.values() if v.startswith('results/')])
-            print(f"✓ Successfully processed {successful_downloads} image URLs with local paths")
-        return updated_rsp
-    except json.JSONDecodeError as e:
-        if log:
-            print(f"❌ Failed to parse updated JSON: {e}")
-            print(f"JSON content (first 500 chars): {updated_rsp_str[:500]}")
-        return rsp  # Return original if parsing fails
 
-def total_results_duplicate_check(total_results):
+def resolve_pictures(result, store):
     """
-    Duplicates have a different hash, this is because there are weird errors which lead to missing fields - but the html is always the same.
-    
-    Search the results for duplicates based on result['card''question''html'] for result in total_results
+    Replace the image URLs whose background download finished with their local paths
 
-    If you find duplicates, remove the one where card has the most values which are "" or None
+    URLs whose download failed are kept, so the card still points to the original image.
+
+    Args:
+        result: Card result as returned by find_goethe_elements
+        store: MediaStore the downloads were saved to
+
+    Returns:
+        The same result, the card is updated in place
     """
-    html_groups = {}
-    for result in total_results:
-        try:
-            # Group results by the HTML of the question
-            html = result['card']['question']['html']
-            if html not in html_groups:
-                html_groups[html] = []
-            html_groups[html].append(result)
-        except (KeyError, TypeError):
-            # Handle malformed results by treating them as unique
-            html_groups[id(result)] = [result]
-
-    def count_empty_fields(res):
-        """Counts how many important fields are empty in a result."""
-        card = res.get('card', {})
-        if not card:
-            return float('inf')  # Should be heavily penalized
-
-        count = 0
-        # Check question text
-        if not card.get('question', {}).get('text'):
-            count += 1
-
-        # Check answer text(s)
-        if res.get('type') == 'card':
-            if not card.get('answer', {}).get('text'):
-                count += 1
-        elif res.get('type') == 'multiple-choice':
-            answers = card.get('answers', [])
-            if not answers or all(not ans.get('text') for ans in answers):
-                count += 1
-        
-        # Check for pictures
-        if res.get('pictures') is None:
-            count += 1
-            
-        return count
-
-    final_results = []
-    for group in html_groups.values():
-        if len(group) <= 1:
-            final_results.extend(group)
-        else:
-            # Find the best result (one with the fewest empty fields)
-            best_result = min(group, key=count_empty_fields)
-            final_results.append(best_result)
+    card = result.get("card")
+
+    if card:
+        refs = find_image_refs(card)
+        url_mapping = {url: store.lookup(url) for url in unique_urls(refs) if store.lookup(url)}
+
+        if url_mapping:
+            rewrite_image_refs(card, refs, url_mapping)
 
-    return final_results
\ No newline at end of file
+    return result
@@ -0,0 +1,113 @@
+import json
+import os
+
+class CardsetWriter:
+    """
+    Streaming writer for the results of one cardset
+
+    Every accepted card is appended as one JSON line (fsynced periodically), so nothing is lost if the
+    run dies and no card has to be kept in memory. 'finish' turns the lines into the final output,
+    either the pretty printed JSON array (compact=True) or a cleaned up JSON lines file.
+    Until then the lines are kept in '<path>.jsonl.part', so an unfinished cardset is never taken for an export.
+    """
+
+    def __init__(self, path, fsync_every=50):
+        """
+        Args:
+            path: Path of the final output without extension (e.g. 'results/data/2025-01-01_12-00_Name_id')
+            fsync_every: Number of cards after which the file is synced to disk (default: 50)
+        """
+        self.path = path
+        self.stream_path = f"{path}.jsonl.part"
+        self.fsync_every = fsync_every
+        self.file = None  # opened on the first card, a skipped cardset leaves no file behind
+        self.unsynced = 0
+
+
+    def write(self, result):
+        """ Append a single card result """
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.stream_path) or ".", exist_ok=True)
+            self.file = open(self.stream_path, 'w', encoding='utf-8')  # a resumed cardset writes its checkpointed cards again
+
+        self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+
+    def sync(self):
+        if self.file and self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+
+    def finish(self, compact=True, keep=None, transform=None):
+        """
+        Stream the appended cards into the final output, one card at a time
+
+        Args:
+            compact: Write the pretty printed JSON array '<path>.json' (default: True), otherwise the JSON lines file '<path>.jsonl'
+            keep: Optional set of card hashes, all other cards are dropped (e.g. worse duplicates)
+                  A card whose hash was already written is dropped as well.
+            transform: Optional function applied to every result before it is written
+
+        Returns:
+            Path of the final output
+        """
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+        final_path = f"{self.path}.json" if compact else f"{self.path}.jsonl"
+        temporary_path = f"{final_path}.tmp"
+
+        with open(temporary_path, 'w', encoding='utf-8') as out:
+            written = 0
+            seen = set()
+
+            for result in self.read():
+                card_hash = result["card"]["hash"]
+                if card_hash in seen or (keep is not None and card_hash not in keep):
+                    continue
+                seen.add(card_hash)
+                if transform:
+                    result = transform(result)
+
+                if not compact:
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                else:
+                    # Same layout as json.dump(results, f, ensure_ascii=False, indent=2)
+                    out.write("[\n" if written == 0 else ",\n")
+                    out.write("  " + json.dumps(result, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+
+                written += 1
+
+            if compact:
+                out.write("\n]" if written else "[]")
+
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(temporary_path, final_path)
+
+        if os.path.exists(self.stream_path):
+            os.remove(self.stream_path)
+
+        return final_path
+
+
+    def read(self):
+        """ Yield the appended card results one by one """
+        if not os.path.exists(self.stream_path):
+            return
+
+        with open(self.stream_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut off by a crash
@@ -0,0 +1,170 @@
+from datetime import datetime
+import threading
+import sqlite3
+import json
+import os
+
+class ScrapeIndex:
+    """
+    Persistent SQLite index of scraped cardsets and their cards (keyed by cardset-href and card hash)
+
+    Cards are checkpointed while a cardset is walked, so an interrupted run continues where it stopped,
+    and completed cardsets whose card count and cards did not change are skipped on the next run.
+    """
+
+    def __init__(self, path="results/index.sqlite", commit_every=25):
+        """
+        Args:
+            path: Location of the SQLite file (default: 'results/index.sqlite')
+            commit_every: Number of checkpointed cards after which the index is committed (default: 25)
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()  # one connection shared by all workers
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+
+            CREATE TABLE IF NOT EXISTS cardsets (
+                href TEXT PRIMARY KEY,
+                text TEXT,
+                count INTEGER,
+                complete INTEGER DEFAULT 0,
+                output_path TEXT,
+                updated_at TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS cards (
+                href TEXT,
+                hash TEXT,
+                position INTEGER,
+                result TEXT,
+                PRIMARY KEY (href, hash)
+            );
+        """)
+        self.connection.commit()
+
+    # - - - CARDSETS - - -
+
+    def begin_cardset(self, cardset):
+        """
+        Register a cardset before walking it, previous cards are dropped if its card count changed
+
+        Returns:
+            Stored row as dictionary, None if the cardset was never seen before
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT count, complete, output_path FROM cardsets WHERE href = ?", (cardset["cardset-href"],)
+            ).fetchone()
+
+            if row and row[0] != cardset["cardset-count"]:
+                self.connection.execute("DELETE FROM cards WHERE href = ?", (cardset["cardset-href"],))
+                self.connection.execute("UPDATE cardsets SET complete = 0 WHERE href = ?", (cardset["cardset-href"],))
+                row = None
+
+            self.connection.execute("""
+                INSERT INTO cardsets (href, text, count, complete, updated_at) VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT(href) DO UPDATE SET text = excluded.text, count = excluded.count, updated_at = excluded.updated_at
+            """, (cardset["cardset-href"], cardset["cardset-text"], cardset["cardset-count"], self.now()))
+            self.connection.commit()
+
+        if not row:
+            return None
+
+        return {"count": row[0], "complete": bool(row[1]), "output_path": row[2]}
+
+
+    def is_complete(self, cardset):
+        """ Whether the cardset was fully exported with its current card count """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT count, complete FROM cardsets WHERE href = ?", (cardset["cardset-href"],)
+            ).fetchone()
+
+        return bool(row and row[1] and row[0] == cardset["cardset-count"])
+
+
+    def complete_cardset(self, cardset, output_path):
+        """ Mark a cardset as fully exported to 'output_path' """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE cardsets SET complete = 1, output_path = ?, updated_at = ? WHERE href = ?",
+                (output_path, self.now(), cardset["cardset-href"])
+            )
+            self.connection.commit()
+            self.pending = 0
+
+
+    def reset_cardset(self, cardset):
+        """ Forget all cards of a cardset, e.g. after its content changed """
+        with self.lock:
+            self.connection.execute("DELETE FROM cards WHERE href = ?", (cardset["cardset-href"],))
+            self.connection.execute("UPDATE cardsets SET complete = 0 WHERE href = ?", (cardset["cardset-href"],))
+            self.connection.commit()
+
+    # - - - CARDS - - -
+
+    def checkpoint_card(self, cardset, result, position):
+        """
+        Persist a scraped card result, cards already known by their hash are ignored
+
+        Args:
+            cardset: Cardset the card belongs to
+            result: Result dictionary as returned by find_goethe_elements
+            position: Position of the card within the walk through the cardset
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO cards (href, hash, position, result) VALUES (?, ?, ?, ?)",
+                (cardset["cardset-href"], result["card"]["hash"], position, json.dumps(result, ensure_ascii=False))
+            )
+
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.connection.commit()
+                self.pending = 0
+
+
+    def load_cards(self, cardset):
+        """ Get all checkpointed card results of a cardset in the order they were scraped """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT result FROM cards WHERE href = ? ORDER BY position, rowid", (cardset["cardset-href"],)
+            ).fetchall()
+
+        return [json.loads(row[0]) for row in rows]
+
+
+    def load_positions(self, cardset):
+        """ Get {position: (card type, hash)} of the checkpointed cards of a cardset, to click past them on a resumed walk """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT position, hash, result FROM cards WHERE href = ?", (cardset["cardset-href"],)
+            ).fetchall()
+
+        return {position: (json.loads(result)["type"], card_hash) for position, card_hash, result in rows}
+
+
+    def known_hashes(self, cardset):
+        """ Get the set of card hashes stored for a cardset """
+        with self.lock:
+            rows = self.connection.execute("SELECT hash FROM cards WHERE href = ?", (cardset["cardset-href"],)).fetchall()
+
+        return {row[0] for row in rows}
+
+    # - - - UTILITY - - -
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+
+    @staticmethod
+    def now():
+        return datetime.now().isoformat(timespec="seconds")
@@ -1,18 +1,82 @@
+from collections import deque
+import threading
+import logging
+import math
 import time
+import os
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support import expected_conditions as ec
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+from utils_logging import get_logger
+
+logger = get_logger("driver")
 
 # - - - - - - - - - -
 
-def setup_driver(url, headless=False):
-    """Set up and return a configured Chrome webdriver"""
+# Resource types which are not needed to read the cards (images are downloaded separately, see ImageDownloader)
+RESOURCE_BLOCK_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",  # images
+    "*.woff", "*.woff2", "*.ttf", "*.otf",                           # fonts
+    "*.css",                                                         # stylesheets
+    "*.mp3", "*.mp4", "*.webm",                                      # media
+]
+
+DRIVER_PROFILES = {
+    # Visible browser, everything loads - for watching and debugging a run
+    "interactive": {
+        "headless": False,
+        "block_resources": False,
+        "page_load_strategy": "normal",
+        "user_data_dir": None,
+        "arguments": [],
+    },
+    # Unattended runs: headless, only the DOM is loaded, the browser profile (cache) is reused
+    "production": {
+        "headless": True,
+        "block_resources": True,
+        "page_load_strategy": "eager",
+        "user_data_dir": "credentials/chrome-profile",
+        "arguments": ["--disable-gpu", "--no-first-run", "--no-default-browser-check", "--mute-audio"],
+    },
+}
+
+# - - - - - - - - - -
+
+def setup_driver(url, headless=False, profile=None, instance=None, capture_network=False):
+    """
+    Set up and return a configured Chrome webdriver
+
+    Args:
+        url: Page to open
+        headless: Whether to run without a visible window (default: False), ignored if a profile is given
+        profile: Optional name of a DRIVER_PROFILES entry (or such a dictionary)
+        instance: Optional number or name of the browser, keeps the user data dirs of parallel browsers (or accounts) apart
+        capture_network: Record the network events in the performance log, needed by NetworkCapture (default: False)
+    """
+    if isinstance(profile, str):
+        if profile not in DRIVER_PROFILES:
+            raise ValueError(f"Unknown driver profile '{profile}', choose one of {list(DRIVER_PROFILES)}")
+        profile = DRIVER_PROFILES[profile]
+
+    profile = profile or dict(DRIVER_PROFILES["interactive"], headless=headless)
+
     options = Options()
     
-    if headless:
-        options.add_argument("--headless")
+    if profile["headless"]:
+        options.add_argument("--headless=new")
+
+    options.page_load_strategy = profile["page_load_strategy"]  # 'eager' continues once the DOM is ready
+
+    if profile["user_data_dir"]:
+        user_data_dir = os.path.abspath(profile["user_data_dir"] + (f"-{instance}" if instance else ""))
+        options.add_argument(f"--user-data-dir={user_data_dir}")  # a warm cache makes the start faster
+
+    for argument in profile["arguments"]:
+        options.add_argument(argument)
 
     # Basic browser options
     options.add_argument("--no-sandbox")
@@ -52,19 +116,24 @@ def setup_driver(url, headless=False):
             'javascript': 1,        # Allow JS generally
             'geolocation': 2,       # Block geolocation
             'notifications': 2,     # Block notifications
-            'images': 1,            # Allow images
+            'images': 2 if profile["block_resources"] else 1,  # Block or allow images
         },
     }
     
     # Add content settings
     options.add_experimental_option('prefs', prefs)
+
+    if capture_network:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})  # the Network.* events, read with get_log('performance')
+
     options.add_argument("--host-resolver-rules=MAP posthog.com 127.0.0.1, MAP *.posthog.com 127.0.0.1")
     
     # Apply options to Chrome driver
     driver = webdriver.Chrome(options=options)
     
     # Add custom request interceptor after driver initialization
-    driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": domains_to_block})
+    blocked_urls = domains_to_block + (RESOURCE_BLOCK_PATTERNS if profile["block_resources"] else [])
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": blocked_urls})
     driver.execute_cdp_cmd('Network.enable', {})
     
     try:
@@ -101,30 +170,111 @@ def setup_driver(url, headless=False):
         domain_results = driver.execute_script(domains_check_script, extracted_domains)
         
         # Print results for each domain
-        print("\nRestricting Tracking:")
+        logger.info("\nRestricting Tracking:")
         all_blocked = True
         for domain, blocked in domain_results.items():
             status = "✅ BLOCKED" if blocked else "❌ NOT BLOCKED"
-            print(f"  {status} - {domain}")
+            logger.info("  %s - %s", status, domain)
             if not blocked:
                 all_blocked = False
         
         if all_blocked:
-            print("\nSuccessfully restriced all tracking domains!")
+            logger.info("\nSuccessfully restriced all tracking domains!")
         else:
-            print(f"\n⚠️ Some tracking domains not blocked - you might want to check the configuration!")
+            logger.warning("\n⚠️ Some tracking domains not blocked - you might want to check the configuration!")
             
-        print("____________________________________________________________")
+        logger.info("____________________________________________________________")
         return driver
 
     except Exception as e:
-        print(f"Error opening browser: {e}")
+        logger.error("Error opening browser: %s", e)
         if driver:
             driver.quit()
         raise
 
 # - - - - - - - - - - -
 
+class WaitScheduler:
+    """
+    Probe schedule of the waits for a screen, learned from how long that screen took to render recently
+
+    The first probe follows after a few milliseconds and the pauses grow exponentially up to 'max_probe'.
+    The page is only refreshed once a wait took longer than the p99 of the recent waits for the same screen
+    type - until 'min_samples' were seen, the caller's fixed deadline is used. One scheduler can be shared
+    by the ActionHandlers of parallel browsers.
+    """
+
+    def __init__(self, first_probe=0.02, backoff=2.0, max_probe=0.5, history=200, min_samples=20, min_refresh=2.0):
+        """
+        Args:
+            first_probe: Seconds until the second probe (default: 0.02)
+            backoff: Factor the pause grows by after every probe (default: 2)
+            max_probe: Longest pause between two probes (default: 0.5 seconds)
+            history: Number of recent latencies kept per screen type (default: 200)
+            min_samples: Latencies needed before the learned p99 replaces the fixed deadline (default: 20)
+            min_refresh: Never refresh earlier than this, even if the screen usually renders faster (default: 2 seconds)
+        """
+        self.first_probe = first_probe
+        self.backoff = backoff
+        self.max_probe = max_probe
+        self.history = history
+        self.min_samples = min_samples
+        self.min_refresh = min_refresh
+
+        self.latencies = {}  # screen type -> recent seconds until it was ready (since the navigation or the last refresh)
+        self.lock = threading.Lock()
+
+
+    def intervals(self):
+        """ Yield the pauses between the probes (endless) """
+        interval = self.first_probe
+        while True:
+            yield interval
+            interval = min(interval * self.backoff, self.max_probe)
+
+
+    def record(self, screen, seconds):
+        with self.lock:
+            self.latencies.setdefault(screen, deque(maxlen=self.history)).append(seconds)
+
+
+    def percentile(self, screen, share=0.99):
+        """ Latency below which 'share' of the recent waits for the screen finished, None with too few samples """
+        with self.lock:
+            latencies = sorted(self.latencies.get(screen, ()))
+
+        if len(latencies) < self.min_samples:
+            return None
+
+        return latencies[max(0, math.ceil(share * len(latencies)) - 1)]
+
+
+    def refresh_deadline(self, screen, default, timeout):
+        """ Seconds after which a wait for the screen refreshes the page, at most half the timeout (so the reload can still finish) """
+        p99 = self.percentile(screen)
+        deadline = default if p99 is None else max(self.min_refresh, p99)
+        return min(deadline, timeout / 2)
+
+
+    def stats(self):
+        """ {screen type: {'samples', 'p50', 'p99'}} of the recent waits """
+        with self.lock:
+            screens = list(self.latencies)
+
+        stats = {}
+        for screen in screens:
+            with self.lock:
+                latencies = sorted(self.latencies[screen])
+            stats[screen] = {
+                "samples": len(latencies),
+                "p50": round(latencies[(len(latencies) - 1) // 2], 3),
+                "p99": round(latencies[max(0, math.ceil(0.99 * len(latencies)) - 1)], 3),
+            }
+
+        return stats
+
+# - - - - - - - - - - -
+
 class ActionHandler:
 
     by_methods = {
@@ -137,9 +287,62 @@ class ActionHandler:
     }
 
 
-    def __init__(self, driver: webdriver.Chrome, wait_time=1):
+    # Cheap (djb2) hash over the outerHTML of everything matching the selector, '' if nothing matches
+    signature_script = """
+        const signature = (selector) => {
+            let hash = 5381, length = 0;
+            for (const e of document.querySelectorAll(selector)) {
+                const html = e.outerHTML;
+                length += html.length;
+                for (let i = 0; i < html.length; i++) {
+                    hash = ((hash << 5) + hash + html.charCodeAt(i)) | 0;
+                }
+            }
+            return length ? length + ':' + (hash >>> 0).toString(16) : '';
+        };
+    """
+
+    wait_for_change_script = signature_script + """
+        const [selector, previous, timeout, done] = arguments;
+
+        let current = signature(selector);
+        if (current !== previous) { done(current); return; }
+
+        let finished = false;
+        const finish = (value) => {
+            if (finished) return;
+            finished = true;
+            observer.disconnect();
+            clearTimeout(timer);
+            done(value);
+        };
+
+        const observer = new MutationObserver(() => {
+            current = signature(selector);
+            if (current !== previous) finish(current);
+        });
+        observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+
+        const timer = setTimeout(() => finish(null), timeout);
+    """
+
+
+    def __init__(self, driver: webdriver.Chrome, wait_time=1, profiler=None, waits: WaitScheduler = None):
+        """
+        Args:
+            driver: Chrome webdriver to act on
+            wait_time: Seconds to wait after every action, unless overwritten per action (default: 1)
+            profiler: Optional Profiler (see utils_profiling) counting and timing every WebDriver round trip
+            waits: Optional WaitScheduler shared with other handlers (default: a new one)
+        """
         self.driver = driver
-        self.wait_time = 1
+        self.wait_time = wait_time
+        self.script_timeout = 30  # chromedriver default for async scripts
+        self.waits = waits or WaitScheduler()
+
+        self.profiler = profiler
+        if profiler:
+            profiler.attach(driver)
 
     # - - - WAIT FOR PAGE LOAD - - -
 
@@ -162,18 +365,17 @@ class ActionHandler:
         
         try:
             if output:
-                print(f"\nChecking for element using {by_method} = '{value}':")
+                logger.debug("\nChecking for element using %s = '%s':", by_method, value)
             
-            wait = WebDriverWait(self.driver, timeout)
-            wait.until(ec.presence_of_element_located((by_method, value)))
+            self.until(ec.presence_of_element_located((by_method, value)), timeout, screen=f"{by_method}={value}")
             
             if output:
-                print(f"✓ Element with {by_method} = '{value}' exists")
+                logger.debug("✓ Element with %s = '%s' exists", by_method, value)
             return True
             
         except Exception as e:
             if output:
-                print(f"❌ Element with {by_method} = '{value}' not found")
+                logger.debug("❌ Element with %s = '%s' not found", by_method, value)
             return False
 
 
@@ -185,13 +387,13 @@ class ActionHandler:
             timeout: How long to wait for the page to load (default: 15 seconds)
         """
         try:
-            print("Waiting for page to load...")
+            logger.debug("Waiting for page to load...")
             
             # Check document.readyState
             WebDriverWait(self.driver, timeout).until(
                 lambda d: d.execute_script('return document.readyState') == 'complete'
             )
-            print("✓ Document ready state complete")
+            logger.debug("✓ Document ready state complete")
             
             # Check that jQuery is done (if jQuery exists)
             jquery_ready = """
@@ -201,7 +403,7 @@ class ActionHandler:
             WebDriverWait(self.driver, 5).until(
                 lambda d: d.execute_script(jquery_ready)
             )
-            print("✓ jQuery requests complete (or jQuery not used)")
+            logger.debug("✓ jQuery requests complete (or jQuery not used)")
             
             # Check for any pending AJAX requests
             ajax_complete = """
@@ -212,11 +414,11 @@ class ActionHandler:
             WebDriverWait(self.driver, 5).until(
                 lambda d: d.execute_script(ajax_complete)
             )
-            print("✓ All AJAX requests complete")
+            logger.debug("✓ All AJAX requests complete")
             
-            print("Page fully loaded")
+            logger.debug("Page fully loaded")
         except Exception as e:
-            print(f"❌ Page did not fully load within timeout: {e}")
+            logger.warning("❌ Page did not fully load within timeout: %s", e)
 
 
     def wait_for_by(self, by_method, value, wait_overwrite=None, timeout=10):
@@ -235,16 +437,137 @@ class ActionHandler:
             by_method = self.by_methods[by_method.lower()]
         
         try:
-            print(f"\nWaiting for element using {by_method} = '{value}':")
+            logger.debug("\nWaiting for element using %s = '%s':", by_method, value)
             
-            wait = WebDriverWait(self.driver, timeout)
-            wait.until(ec.presence_of_element_located((by_method, value)))
-            wait.until(ec.visibility_of_element_located((by_method, value)))
+            self.until(ec.presence_of_element_located((by_method, value)), timeout, screen=f"{by_method}={value}")
+            self.until(ec.visibility_of_element_located((by_method, value)), timeout, screen=f"{by_method}={value}")
             
-            print(f"✓ Element with {by_method} = '{value}' is present and visible")
+            logger.debug("✓ Element with %s = '%s' is present and visible", by_method, value)
             
         except Exception as e:
-            print(f"❌ Element with {by_method} = '{value}' not found")
+            logger.warning("❌ Element with %s = '%s' not found", by_method, value)
+
+
+    def wait_for_screen(self, screen, probe, timeout=15, refresh=True, refresh_after=None, started=None):
+        """
+        Probe the page until a screen is ready, on the schedule of the WaitScheduler
+
+        Reacts within milliseconds if the screen is already there, backs off exponentially otherwise and
+        refreshes the page (once) only if the wait took longer than the screens of this type usually take.
+        The render latency counts from 'started' (the click or navigation which leads to the screen), callers
+        which already waited for the change in between would otherwise learn latencies of a few milliseconds.
+
+        Args:
+            screen: Screen type the render latency is learned for (e.g. 'card', 'course')
+            probe: Function checking the page once, called with the seconds it may block if the screen is not
+                   ready yet (e.g. in a MutationObserver wait); returns None until the screen is ready
+            timeout: Seconds until giving up (default: 15 seconds)
+            refresh: Whether to refresh the page once the learned p99 is exceeded (default: True)
+            refresh_after: Refresh deadline until enough waits for the screen were seen (default: half the timeout)
+            started: time.perf_counter() of the click or navigation leading to the screen (default: now)
+
+        Returns:
+            The result of the probe, None if the screen was not ready within the timeout
+        """
+        end = time.perf_counter() + timeout
+        start = loaded = time.perf_counter() if started is None else started
+        refresh_at = start + self.waits.refresh_deadline(screen, timeout / 2 if refresh_after is None else refresh_after, timeout) if refresh else None
+
+        for interval in self.waits.intervals():
+            decision = end if refresh_at is None else min(end, refresh_at)
+            result = probe(max(0.0, min(interval, decision - time.perf_counter())))
+
+            now = time.perf_counter()
+
+            if result is not None:
+                self.waits.record(screen, now - loaded)
+                return result
+
+            if now >= end:
+                self.waits.record(screen, now - loaded)  # pages slower than the timeout raise the p99 as well, against early refreshes
+                return None
+
+            if refresh_at is not None and now >= refresh_at:
+                logger.debug("🔄 '%s' not ready after %.1fs, refreshing the page", screen, now - start)
+                self.driver.refresh()
+                loaded = time.perf_counter()  # latencies are measured from the reload, it is a regular page load
+                refresh_at = None
+
+
+    def until(self, condition, timeout=10, screen=None):
+        """
+        Like WebDriverWait(driver, timeout).until(condition), polled on the schedule of the WaitScheduler instead of every 0.5 seconds
+
+        Raises:
+            TimeoutException if the condition was not met within the timeout
+        """
+        def probe(budget):
+            try:
+                result = condition(self.driver)
+            except (NoSuchElementException, StaleElementReferenceException):
+                result = None
+
+            if result:
+                return result
+
+            if budget > 0:
+                start = time.perf_counter()
+                time.sleep(budget)
+                if self.profiler:
+                    self.profiler.record("sleep", start, time.perf_counter() - start)
+            return None
+
+        result = self.wait_for_screen(screen or "element", probe, timeout=timeout, refresh=False)
+        if result is None:
+            raise TimeoutException(f"Condition not met within {timeout}s")
+
+        return result
+
+
+    def content_signature(self, selector):
+        """
+        Get a cheap signature of the content matching a CSS selector, pass it to wait_for_change later
+        
+        Args:
+            selector: CSS selector of the content to watch (e.g. '.goethe-container')
+        
+        Returns:
+            Signature string ('' if nothing matches the selector)
+        """
+        return self.driver.execute_script(self.signature_script + "return signature(arguments[0]);", selector)
+
+
+    def wait_for_change(self, selector, previous, timeout=5):
+        """
+        Wait until the content matching a CSS selector differs from a previously taken signature
+        
+        A MutationObserver is injected, so this returns as soon as the page re-rendered instead of
+        sleeping a fixed time. Changes which happened before the call are detected immediately.
+        
+        Args:
+            selector: CSS selector of the watched content
+            previous: Signature taken with content_signature before triggering the change
+            timeout: Maximum time to wait in seconds (default: 5 seconds)
+        
+        Returns:
+            The new signature, or None if nothing changed within the timeout
+        """
+        try:
+            return self.execute_async_script(self.wait_for_change_script, selector, previous, int(timeout * 1000), timeout=timeout)
+        except Exception as e:
+            logger.warning("❌ Waiting for change of '%s' failed: %s", selector, e)
+            return None
+
+
+    def execute_async_script(self, script, *args, timeout=10):
+        """
+        Run an asynchronous script (its callback is the last argument), making sure the driver lets it run for 'timeout' seconds
+        """
+        if timeout + 1 > self.script_timeout:  # The async script has to be allowed to run long enough
+            self.driver.set_script_timeout(timeout + 1)
+            self.script_timeout = timeout + 1
+
+        return self.driver.execute_async_script(script, *args)
 
     # - - - GET ALL - - -
 
@@ -268,20 +591,19 @@ class ActionHandler:
         
         try:
             if output:
-                print(f"\nLooking for elements using {by_method} = '{value}':")
+                logger.debug("\nLooking for elements using %s = '%s':", by_method, value)
             
-            wait = WebDriverWait(self.driver, timeout)
-            wait.until(ec.presence_of_all_elements_located((by_method, value)))
+            self.until(ec.presence_of_all_elements_located((by_method, value)), timeout, screen=f"{by_method}={value}")
             
             elements = self.driver.find_elements(by_method, value)
             if output:
-                print(f"✓ Found {len(elements)} elements")
+                logger.debug("✓ Found %d elements", len(elements))
             
             return elements
             
         except Exception as e:
             if output:
-                print(f"❌ Elements with {by_method} = '{value}' not found")
+                logger.debug("❌ Elements with %s = '%s' not found", by_method, value)
             return []
         
     def get_all_by_return_href(self, by_method, value, wait_overwrite=None, timeout=10):
@@ -323,51 +645,50 @@ class ActionHandler:
             
         try:
             if output:
-                print(f"\nLooking for '{description}' using {by_method} = '{value}':")
-            
-            wait = WebDriverWait(self.driver, timeout)  # Try multiple wait conditions
+                logger.debug("\nLooking for '%s' using %s = '%s':", description, by_method, value)
             
             # First wait for element to be present
-            wait.until(ec.presence_of_element_located((by_method, value)))
+            self.until(ec.presence_of_element_located((by_method, value)), timeout, screen=f"{by_method}={value}")
             if output:
-                print(f"✓ Element present")
+                logger.debug("✓ Element present")
             
             # Then wait for it to be visible
-            wait.until(ec.visibility_of_element_located((by_method, value)))
+            self.until(ec.visibility_of_element_located((by_method, value)), timeout, screen=f"{by_method}={value}")
             if output:
-                print(f"✓ Element visible")
+                logger.debug("✓ Element visible")
             
             # Find the element
             element = self.driver.find_element(by_method, value)
-            if output:
-                print(f"✓ Element found: {element.tag_name}")
+            if output and logger.isEnabledFor(logging.DEBUG):  # tag_name is another round trip
+                logger.debug("✓ Element found: %s", element.tag_name)
             
             # Perform the action
             self.handler(element, handling, wait_overwrite)
             if output:
-                print(f"✓ Action completed on '{description}'")
+                logger.debug("✓ Action completed on '%s'", description)
             
         except Exception as e:
             if output:
-                print(f"❌ '{description}' with value '{value}' not found")
+                logger.warning("❌ '%s' with value '%s' not found", description, value)
                 
-                # Additional debugging info
+            # Additional debugging info (costs several round trips)
+            if output and logger.isEnabledFor(logging.DEBUG):
                 try:
-                    print(f"🔍 Current page title: {self.driver.title}")
-                    print(f"🔍 Current URL: {self.driver.current_url}")
+                    logger.debug("🔍 Current page title: %s", self.driver.title)
+                    logger.debug("🔍 Current URL: %s", self.driver.current_url)
                     
                     # Try to find similar elements for debugging
                     if by_method == By.NAME:
                         all_inputs = self.driver.find_elements(By.TAG_NAME, "input")
-                        print(f"🔍 Found {len(all_inputs)} input elements:")
+                        logger.debug("🔍 Found %d input elements:", len(all_inputs))
                         for i, inp in enumerate(all_inputs[:5]):  # Show first 5
                             name_attr = inp.get_attribute("name") or "No name"
                             type_attr = inp.get_attribute("type") or "No type"
                             placeholder_attr = inp.get_attribute("placeholder") or "No placeholder"
-                            print(f"   {i+1}. name='{name_attr}', type='{type_attr}', placeholder='{placeholder_attr}'")
+                            logger.debug("   %d. name='%s', type='%s', placeholder='%s'", i + 1, name_attr, type_attr, placeholder_attr)
                             
                 except Exception as debug_e:
-                    print(f"🔍 Debug info failed: {debug_e}")
+                    logger.debug("🔍 Debug info failed: %s", debug_e)
             
             # Don't continue execution, let the error bubble up
             return False
@@ -391,19 +712,21 @@ class ActionHandler:
                 element.clear()  # For input fields, first clear any existing content
                 text_to_send = action[2:]  # Then send the text
                 element.send_keys(text_to_send)
-                print(f"✓ Typed text into element")
+                logger.debug("✓ Typed text into element")
                 
             elif action == 'click':
-                wait = WebDriverWait(self.driver, 10)  # Wait for element to be clickable
-                wait.until(ec.element_to_be_clickable(element))
+                self.until(ec.element_to_be_clickable(element), 10, screen="clickable")  # Wait for element to be clickable
                 element.click()
-                print(f"✓ Clicked element")
+                logger.debug("✓ Clicked element")
 
             # Wait for the specified or given time after any action
-            wait_time = wait_overwrite if wait_overwrite else self.wait_time
+            wait_time = wait_overwrite if wait_overwrite is not None else self.wait_time
             if wait_time > 0:
+                start = time.perf_counter()
                 time.sleep(wait_time)
+                if self.profiler:
+                    self.profiler.record("sleep", start, time.perf_counter() - start)
                 
         except Exception as e:
-            print(f"❌ Action '{action}' failed: {e}")
+            logger.warning("❌ Action '%s' failed: %s", action, e)
             raise
@@ -0,0 +1,153 @@
+import logging
+import json
+import time
+import sys
+import os
+
+# - - - - - - - - - -
+
+ROOT_LOGGER = "buffl"
+PROGRESS_LOGGER = "buffl.progress"  # separate channel, not mixed into the regular log output
+
+# - - - - - - - - - -
+
+def get_logger(name):
+    """
+    Logger of a module, below the 'buffl' root configured by setup_logging
+
+    Messages use lazy %-formatting (logger.debug("Found %d images", count)), so disabled levels cost
+    neither the formatting nor building the arguments - guard expensive arguments with logger.isEnabledFor.
+    """
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def setup_logging(level="INFO", jsonl_path=None, progress=True):
+    """
+    Configure the console output and the optional JSON lines sink
+
+    Only called by the entry points (_main.py, _batch.py, the debug scripts), importing the modules leaves
+    the logging of the caller alone.
+
+    Args:
+        level: Level of the console output, 'DEBUG' shows every element probe and image step (default: 'INFO')
+        jsonl_path: Optional file every record (down to DEBUG) is appended to as one JSON object per line
+        progress: Show the progress channel (cards/sec, ETA) on the console (default: True)
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers.clear()
+    root.propagate = False
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(level)
+    console.setFormatter(logging.Formatter("%(message)s"))  # same look as the former print output
+    root.addHandler(console)
+
+    root_level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    if jsonl_path:
+        os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+        sink = JsonLinesHandler(jsonl_path)
+        sink.setLevel(logging.DEBUG)
+        root.addHandler(sink)
+        root_level = logging.DEBUG
+
+    root.setLevel(root_level)
+
+    progress_logger = logging.getLogger(PROGRESS_LOGGER)
+    progress_logger.handlers.clear()
+    progress_logger.propagate = bool(jsonl_path)  # progress only reaches the root for the JSON lines sink
+    progress_logger.setLevel(logging.INFO)
+
+    if progress:
+        progress_console = logging.StreamHandler(sys.stderr)
+        progress_console.setFormatter(logging.Formatter("%(message)s"))
+        progress_logger.addHandler(progress_console)
+
+    if jsonl_path:
+        console.addFilter(lambda record: record.name != PROGRESS_LOGGER)  # kept apart from the regular output
+
+
+class JsonLinesHandler(logging.Handler):
+    """ Appends every record as one JSON object per line (time, level, logger, thread, message and the 'extra' fields) """
+
+    # Attributes every LogRecord has, everything else was passed via 'extra'
+    STANDARD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def __init__(self, path):
+        super().__init__()
+        self.file = open(path, 'a', encoding='utf-8')
+
+
+    def emit(self, record):
+        try:
+            entry = {
+                "time": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "thread": record.threadName,  # the worker / account a record belongs to in parallel runs
+                "message": record.getMessage(),
+            }
+            entry.update({k: v for k, v in vars(record).items() if k not in self.STANDARD_FIELDS})
+
+            self.acquire()
+            try:
+                self.file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                self.file.flush()
+            finally:
+                self.release()
+        except Exception:
+            self.handleError(record)
+
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+# - - - PROGRESS - - -
+
+class Progress:
+    """
+    Progress of one cardset (cards/sec and ETA), reported on the progress channel at most every 'interval' seconds
+    """
+
+    def __init__(self, label, total, interval=5):
+        """
+        Args:
+            label: Name shown in the progress lines (e.g. the cardset name)
+            total: Expected number of cards
+            interval: Minimum seconds between two progress lines (default: 5)
+        """
+        self.logger = logging.getLogger(PROGRESS_LOGGER)
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.reported = 0.0
+        self.done = 0
+
+
+    def update(self, done, force=False):
+        """ Set the number of finished cards, a line is logged if the interval passed (or with 'force') """
+        self.done = done
+        now = time.perf_counter()
+
+        if not force and now - self.reported < self.interval:
+            return
+        self.reported = now
+
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 and self.total > done else 0.0
+
+        self.logger.info(
+            "⏱ %s: %d/%d cards, %.2f cards/s, ETA %ds", self.label, done, self.total, rate, eta,
+            extra={"cardset": self.label, "done": done, "total": self.total, "rate": round(rate, 3), "eta": round(eta, 1)}
+        )
+
+
+    def finish(self):
+        self.update(self.done, force=True)
+
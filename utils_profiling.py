@@ -0,0 +1,185 @@
+import threading
+import json
+import time
+import sys
+import os
+
+# - - - - - - - - - -
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROCEDURES_DIR = os.path.join(ROOT_DIR, "procedures")
+UTILS_FILE = os.path.join(ROOT_DIR, "utils_generic.py")
+WAIT_HELPERS = ("wait_for_screen", "until")  # generic ActionHandler waits, attributed to the method which called them
+
+# - - - - - - - - - -
+
+class Profiler:
+    """
+    Counts and times every WebDriver round trip of the attached ActionHandlers
+
+    Each command is attributed to its call site (the function in procedures/ or _main.py it originates from,
+    e.g. 'find_goethe_elements' or 'click_icon') and to the ActionHandler method it went through
+    ('element_exists', 'action_by', 'handler', ...; 'driver' for direct driver calls). The fixed waits
+    of ActionHandler.handler are recorded as the command 'sleep'.
+
+    One profiler can be shared by several handlers (e.g. parallel workers), every thread gets its own track.
+    """
+
+    def __init__(self, trace=True):
+        """
+        Args:
+            trace: Keep every single command for the trace files, otherwise only the totals are kept (default: True)
+        """
+        self.trace = trace
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.totals = {}  # (call site, operation, command) -> [count, seconds]
+        self.events = []  # (call site, operation, command, start, duration, thread id)
+
+
+    def attach(self, driver):
+        """ Route all commands of a driver through the profiler """
+        execute = driver.execute
+
+        def profiled(command, params=None):
+            start = time.perf_counter()
+            try:
+                return execute(command, params)
+            finally:
+                self.record(command, start, time.perf_counter() - start)
+
+        driver.execute = profiled
+
+
+    def record(self, command, start, duration):
+        """ Add one timed command, attributed to the current call stack """
+        call_site, operation = call_origin(sys._getframe(1))
+        key = (call_site, operation, command)
+
+        with self.lock:
+            total = self.totals.setdefault(key, [0, 0.0])
+            total[0] += 1
+            total[1] += duration
+
+            if self.trace:
+                self.events.append((call_site, operation, command, start, duration, threading.get_ident()))
+
+    # - - - REPORTS - - -
+
+    def report(self):
+        """
+        Summary of the run
+
+        Returns:
+            Dictionary with the overall totals and the breakdown by call site, by operation and by
+            (call site, operation, command), the heaviest entries first
+        """
+        with self.lock:
+            totals = dict(self.totals)
+
+        def grouped(key):
+            groups = {}
+            for entry, (count, seconds) in totals.items():
+                group = groups.setdefault(key(entry), {"calls": 0, "seconds": 0.0})
+                group["calls"] += count
+                group["seconds"] += seconds
+            return {
+                name: {"calls": group["calls"], "seconds": round(group["seconds"], 4), "mean_ms": round(group["seconds"] / group["calls"] * 1000, 2)}
+                for name, group in sorted(groups.items(), key=lambda item: -item[1]["seconds"])
+            }
+
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "calls": sum(count for count, _ in totals.values()),
+            "seconds": round(sum(seconds for _, seconds in totals.values()), 4),
+            "by_call_site": grouped(lambda entry: entry[0]),
+            "by_operation": grouped(lambda entry: entry[1]),
+            "by_command": grouped(lambda entry: entry[2]),
+            "detail": grouped(lambda entry: " > ".join(entry)),
+        }
+
+
+    def save(self, path):
+        """
+        Write the report to '<path>.json' and, if traced, the trace to '<path>.trace.json' (Chrome trace format,
+        open it in ui.perfetto.dev or speedscope) and '<path>.folded' (collapsed stacks for flamegraph.pl)
+
+        Returns:
+            List of the written files
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        written = [f"{path}.json"]
+
+        with open(f"{path}.json", 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+        if self.trace:
+            with open(f"{path}.trace.json", 'w', encoding='utf-8') as f:
+                json.dump(self.chrome_trace(), f)
+
+            with open(f"{path}.folded", 'w', encoding='utf-8') as f:
+                for stack, microseconds in self.collapsed_stacks().items():
+                    f.write(f"{stack} {microseconds}\n")
+
+            written += [f"{path}.trace.json", f"{path}.folded"]
+
+        return written
+
+
+    def chrome_trace(self):
+        """ Trace Event Format: one complete event per command on the track of its thread """
+        with self.lock:
+            events = list(self.events)
+
+        return {
+            "traceEvents": [
+                {
+                    "name": command,
+                    "cat": operation,
+                    "ph": "X",
+                    "ts": round((start - self.started) * 1_000_000, 1),
+                    "dur": round(duration * 1_000_000, 1),
+                    "pid": os.getpid(),
+                    "tid": thread,
+                    "args": {"call_site": call_site, "operation": operation},
+                }
+                for call_site, operation, command, start, duration, thread in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+
+    def collapsed_stacks(self):
+        """ 'call site;operation;command' -> microseconds """
+        with self.lock:
+            totals = dict(self.totals)
+
+        return {";".join(key): int(seconds * 1_000_000) for key, (_, seconds) in totals.items()}
+
+# - - - UTILITY - - -
+
+def call_origin(frame):
+    """
+    Walk up the stack to the innermost ActionHandler method and the innermost function of the scraper itself
+
+    Probes passed to the waits are attributed to the function they are defined in (e.g. 'find_cardset_elements').
+
+    Returns:
+        Tuple (call site, operation)
+    """
+    operation = None
+
+    while frame is not None:
+        filename = frame.f_code.co_filename
+
+        if filename == UTILS_FILE and frame.f_code.co_varnames[:1] == ("self",):
+            if operation is None or operation in WAIT_HELPERS:
+                operation = frame.f_code.co_name
+
+        elif filename.startswith(PROCEDURES_DIR) or (os.path.dirname(filename) == ROOT_DIR and filename not in (UTILS_FILE, __file__)):
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name).split(".<locals>")[0]
+            return name, operation or "driver"
+
+        frame = frame.f_back
+
+    return "other", operation or "driver"